@@ -1,7 +1,10 @@
 from motor.motor_asyncio import AsyncIOMotorClient
 from passlib.context import CryptContext
 import certifi
+import datetime
 import os
+import time
+from collections import OrderedDict
 
 
 # Password hashing
@@ -23,6 +26,25 @@ else:
 db = client[DB_NAME]
 users_collection = db["users"]
 
+# Minimum seconds between last_active writes for one user
+LAST_ACTIVE_WRITE_INTERVAL = int(os.getenv("LAST_ACTIVE_WRITE_INTERVAL", "3600"))
+_last_active_written = OrderedDict()  # phone -> monotonic time of the last write, oldest first
+
+
+async def touch_last_active(phone: str):
+    """Record that a user used the app (throttled), so background jobs can skip dormant users."""
+    now = time.monotonic()
+    # Entries past the interval no longer throttle anything; dropping them bounds the dict by recent users
+    while _last_active_written and now - next(iter(_last_active_written.values())) >= LAST_ACTIVE_WRITE_INTERVAL:
+        _last_active_written.popitem(last=False)
+    if phone in _last_active_written:
+        return
+    _last_active_written[phone] = now
+    try:
+        await users_collection.update_one({"phone": phone}, {"$set": {"last_active": datetime.datetime.now(datetime.timezone.utc)}})
+    except Exception as e:
+        print(f"❌ last_active update failed: {e}")
+
 
 # Helper to format MongoDB user document
 def user_helper(user) -> dict:
@@ -1,8 +1,9 @@
 from fastapi import APIRouter, HTTPException
 import traceback
+import datetime
 from auth.models import RegisterUser, LoginUser, UserProfile, Location
-from auth.database import users_collection, pwd_context, user_helper
-from location_detector.location import get_location_from_coords
+from auth.database import users_collection, pwd_context, user_helper, touch_last_active
+from location_detector.location import get_location_from_coords_async
 
 router = APIRouter()
 
@@ -27,7 +28,7 @@ async def register(user: RegisterUser):
 
         new_user = user.dict()
         if user.lat and user.lon:
-            location = get_location_from_coords(user.lat, user.lon)
+            location = await get_location_from_coords_async(user.lat, user.lon)
             new_user["location"] = {
                 "lat": user.lat,
                 "lon": user.lon,
@@ -35,6 +36,7 @@ async def register(user: RegisterUser):
                 "district": location["district"]
             }
         new_user["password"] = hashed_pw
+        new_user["last_active"] = datetime.datetime.now(datetime.timezone.utc)
     
 
         # Insert into MongoDB
@@ -54,6 +56,7 @@ async def login(user: LoginUser):
         if not pwd_context.verify(user.password, existing_user["password"]):
             raise HTTPException(status_code=401, detail="Invalid password")
 
+        await touch_last_active(user.phone)
         return {"message": f"Welcome {existing_user['name']}, login successful!"}
     except Exception as e:
         print(f"Error in /login: {traceback.format_exc()}")
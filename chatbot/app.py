@@ -1,13 +1,27 @@
+import os
 import requests
 import json
 from google.cloud import speech_v1p1beta1 as speech
-from langdetect import detect, DetectorFactory
-
-# Ensure consistent language detection
-DetectorFactory.seed = 0
+from chatbot.language import detect_language
+from cloud_clients import client_registry
 
 API_KEY = "YOUR_API_KEY"
 API_URL = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-preview-05-20:generateContent?key={API_KEY}"
+API_STREAM_URL = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-preview-05-20:streamGenerateContent?alt=sse&key={API_KEY}"
+
+# Same settings as the async client in chatbot.gemini_client (seconds)
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "30"))
+GEMINI_CONNECT_TIMEOUT = float(os.getenv("GEMINI_CONNECT_TIMEOUT", "5"))
+
+# Prefixes of the fallback messages get_gemini_response returns instead of raising
+GEMINI_ERROR_PREFIXES = (
+    "An error occurred",
+    "Sorry, I couldn't get a response",
+)
+
+def is_gemini_error(response_text: str) -> bool:
+    """True if a get_gemini_response result is a fallback error message, not an answer."""
+    return not response_text or response_text.startswith(GEMINI_ERROR_PREFIXES)
 
 def get_system_instruction(response_language):
     """
@@ -21,32 +35,20 @@ def get_system_instruction(response_language):
         }]
     }
 
-def get_gemini_response(user_query):
+def detect_response_language(user_query):
     """
-    Sends the user's query to the Gemini API and retrieves the response in the detected language.
+    Picks the language Gemini should answer in, based on the user's query.
     """
-    # Detect the language of the user query
-    try:
-        detected_lang = detect(user_query)
-    except:
-        detected_lang = "en"  # Fallback to English if detection fails
-
-    # Map detected language codes to human-readable language names
-    lang_map = {
-        "en": "English",
-        "hi": "Hindi",
-        "pa": "Punjabi",
-        # Add more mappings as needed
-    }
-    
-    # Handle Hinglish (often detected as Hindi or English)
-    if "hinglish" in user_query.lower() or (detected_lang in ["hi", "en"] and any(word in user_query.lower() for word in ["bhai", "yaar", "mix", "bol"])):
-        response_language = "Hinglish"
-    else:
-        response_language = lang_map.get(detected_lang, "English")  # Default to English if language not in map
+    return detect_language(user_query)
 
-    payload = {
-        "contents": [{
+def build_gemini_payload(user_query, response_language, history=None):
+    """
+    Request body for generateContent: the query plus the system instruction.
+    `history` is a list of earlier user/model `contents` entries for multi-turn chat.
+    """
+    return {
+        "contents": (history or []) + [{
+            "role": "user",
             "parts": [{
                 "text": user_query
             }]
@@ -54,31 +56,45 @@ def get_gemini_response(user_query):
         "systemInstruction": get_system_instruction(response_language)
     }
 
+def extract_response_text(result):
+    """
+    Pulls the answer text out of a generateContent response, or returns the fallback message.
+    """
+    bot_response_text = result.get('candidates', [{}])[0].get('content', {}).get('parts', [{}])[0].get('text')
+    
+    if bot_response_text:
+        return bot_response_text
+    else:
+        return "Sorry, I couldn't get a response. Please try again."
+
+def get_gemini_response(user_query):
+    """
+    Sends the user's query to the Gemini API and retrieves the response in the detected language.
+    """
+    payload = build_gemini_payload(user_query, detect_response_language(user_query))
+
     try:
-        response = requests.post(API_URL, headers={'Content-Type': 'application/json'}, data=json.dumps(payload))
+        response = requests.post(API_URL, headers={'Content-Type': 'application/json'}, data=json.dumps(payload),
+                                 timeout=(GEMINI_CONNECT_TIMEOUT, GEMINI_TIMEOUT))
         response.raise_for_status()  # Check for HTTP errors
 
-        result = response.json()
-        
-        bot_response_text = result.get('candidates', [{}])[0].get('content', {}).get('parts', [{}])[0].get('text')
-        
-        if bot_response_text:
-            return bot_response_text
-        else:
-            return "Sorry, I couldn't get a response. Please try again."
+        return extract_response_text(response.json())
             
     except requests.exceptions.RequestException as e:
         return f"An error occurred while connecting to the API: {e}"
     except (json.JSONDecodeError, KeyError) as e:
         return f"An error occurred while parsing the API response: {e}"
 
-def transcribe_audio(audio_content: bytes, lang: str = None) -> tuple[str, str]:
+def get_speech_client():
     """
-    Transcribes audio to text using Google Cloud Speech-to-Text.
-    Returns (transcript, detected_language).
+    Shared Speech-to-Text client from the process-wide client registry.
     """
-    client = speech.SpeechClient()
+    return client_registry.get("stt")
 
+def build_recognition_request(audio_content: bytes) -> dict:
+    """
+    Keyword arguments for `recognize`: the Hindi-optimized config plus the audio.
+    """
     # Configure recognition with Hindi optimization
     config = speech.RecognitionConfig(
         encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,  # Adjust for MP3 if needed
@@ -90,15 +106,35 @@ def transcribe_audio(audio_content: bytes, lang: str = None) -> tuple[str, str]:
     )
 
     audio = speech.RecognitionAudio(content=audio_content)
+    return {"config": config, "audio": audio}
+
+def parse_recognition_response(response) -> tuple[str, str]:
+    if response.results:
+        transcript = response.results[0].alternatives[0].transcript
+        detected_lang = response.results[0].language_code
+        return transcript, detected_lang
+    else:
+        return "No speech detected.", 'en-US'  # Fallback
+
+def transcribe_audio(audio_content: bytes, lang: str = None) -> tuple[str, str]:
+    """
+    Transcribes audio to text using Google Cloud Speech-to-Text.
+    Returns (transcript, detected_language).
+    """
+    try:
+        response = get_speech_client().recognize(**build_recognition_request(audio_content))
+        return parse_recognition_response(response)
+    except Exception as e:
+        print(f"STT failed: {e}")
+        return "Transcription failed.", 'en-US'
 
+async def transcribe_audio_async(audio_content: bytes, lang: str = None) -> tuple[str, str]:
+    """
+    Async variant of `transcribe_audio` on the shared asyncio Speech-to-Text client.
+    """
     try:
-        response = client.recognize(config=config, audio=audio)
-        if response.results:
-            transcript = response.results[0].alternatives[0].transcript
-            detected_lang = response.results[0].language_code
-            return transcript, detected_lang
-        else:
-            return "No speech detected.", 'en-US'  # Fallback
+        response = await client_registry.get_async("stt").recognize(**build_recognition_request(audio_content))
+        return parse_recognition_response(response)
     except Exception as e:
         print(f"STT failed: {e}")
         return "Transcription failed.", 'en-US'
@@ -0,0 +1,96 @@
+"""Compare per-prompt latency of the language router against the old langdetect path.
+
+Usage:
+    python -m chatbot.benchmark_language --runs 2000
+    python -m chatbot.benchmark_language --prompts prompts.txt
+"""
+import argparse
+import time
+import numpy as np
+from langdetect import detect
+from chatbot.language import detect_language, _route
+
+SAMPLE_PROMPTS = [
+    "What is the best fertilizer for wheat?",
+    "How much water does paddy need in July?",
+    "Tomato leaves are turning yellow, what should I do?",
+    "Gehu me urea kab dalna chahiye?",
+    "bhai sarson ki fasal me keeda lag gaya hai",
+    "yaar cotton ke liye konsa spray best hai",
+    "गेहूं में पीला रतुआ रोग का इलाज क्या है?",
+    "धान की रोपाई कब करनी चाहिए?",
+    "ਕਣਕ ਵਿੱਚ ਖਾਦ ਕਦੋਂ ਪਾਈਏ?",
+    "ਝੋਨੇ ਦੀ ਫਸਲ ਲਈ ਪਾਣੀ ਕਿੰਨਾ ਚਾਹੀਦਾ ਹੈ?",
+    "Please answer in Hinglish: aloo ki kheti kaise kare",
+    "गेहूं me DAP kitna dale?",
+]
+
+
+def legacy_detect_response_language(user_query):
+    """The detect_response_language implementation this router replaced."""
+    try:
+        detected_lang = detect(user_query)
+    except Exception:
+        detected_lang = "en"
+    lang_map = {
+        "en": "English",
+        "hi": "Hindi",
+        "pa": "Punjabi",
+    }
+    if "hinglish" in user_query.lower() or (detected_lang in ["hi", "en"] and any(word in user_query.lower() for word in ["bhai", "yaar", "mix", "bol"])):
+        return "Hinglish"
+    return lang_map.get(detected_lang, "English")
+
+
+def measure(detect_fn, prompts: list[str], runs: int) -> dict:
+    timings = []
+    for i in range(runs):
+        prompt = prompts[i % len(prompts)]
+        start = time.perf_counter()
+        detect_fn(prompt)
+        timings.append((time.perf_counter() - start) * 1e6)
+
+    timings = np.array(timings)
+    return {
+        "p50_us": float(np.percentile(timings, 50)),
+        "p99_us": float(np.percentile(timings, 99)),
+        "mean_us": float(timings.mean()),
+    }
+
+
+def uncached_detect(prompt: str) -> str:
+    _route.cache_clear()
+    return detect_language(prompt)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=1000)
+    parser.add_argument("--prompts", help="Text file with one prompt per line (built-in samples if omitted)")
+    args = parser.parse_args()
+
+    prompts = SAMPLE_PROMPTS
+    if args.prompts:
+        with open(args.prompts, "r", encoding="utf-8") as f:
+            prompts = [line.strip() for line in f if line.strip()]
+
+    # Load langdetect's profiles up front so the first timed call is not skewed
+    legacy_detect_response_language(prompts[0])
+
+    results = {
+        "legacy (langdetect)": measure(legacy_detect_response_language, prompts, args.runs),
+        "router (uncached)": measure(uncached_detect, prompts, args.runs),
+        "router (memoized)": measure(detect_language, prompts, args.runs),
+    }
+    for name, stats in results.items():
+        print(f"{name:>20}: p50 {stats['p50_us']:8.1f}us  p99 {stats['p99_us']:8.1f}us  mean {stats['mean_us']:8.1f}us")
+
+    print()
+    for prompt in prompts:
+        legacy, routed = legacy_detect_response_language(prompt), detect_language(prompt)
+        marker = " " if legacy == routed else "*"
+        print(f"{marker} {legacy:>8} -> {routed:<8} {prompt}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+import httpx
+from chatbot.app import API_URL, API_STREAM_URL, build_gemini_payload, detect_response_language, extract_response_text
+
+# Tunables (override via environment)
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "30"))  # seconds, per attempt
+GEMINI_CONNECT_TIMEOUT = float(os.getenv("GEMINI_CONNECT_TIMEOUT", "5"))
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "200"))
+GEMINI_MAX_CONNECTIONS = int(os.getenv("GEMINI_MAX_CONNECTIONS", "100"))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "3"))
+GEMINI_BACKOFF_BASE = float(os.getenv("GEMINI_BACKOFF_BASE", "0.5"))  # seconds
+GEMINI_BACKOFF_MAX = float(os.getenv("GEMINI_BACKOFF_MAX", "8"))
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_client = None
+_semaphore = None
+
+# Single-flight: payload hash -> task of the upstream call shared by identical concurrent prompts
+_inflight = {}
+_flight_stats = {"upstream_calls": 0, "deduplicated_calls": 0}
+
+
+def get_client() -> httpx.AsyncClient:
+    """Shared keep-alive client (HTTP/2 when the `h2` package is installed), created on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        try:
+            import h2  # noqa: F401
+            http2 = True
+        except ImportError:
+            http2 = False
+        _client = httpx.AsyncClient(
+            http2=http2,
+            timeout=httpx.Timeout(GEMINI_TIMEOUT, connect=GEMINI_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=GEMINI_MAX_CONNECTIONS,
+                max_keepalive_connections=GEMINI_MAX_CONNECTIONS,
+                keepalive_expiry=60,
+            ),
+            headers={'Content-Type': 'application/json'},
+        )
+    return _client
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+    return _semaphore
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _backoff(attempt: int, retry_after: str | None = None) -> float:
+    """Full-jitter exponential backoff, honouring a numeric Retry-After header."""
+    if retry_after:
+        try:
+            return min(float(retry_after), GEMINI_BACKOFF_MAX)
+        except ValueError:
+            pass
+    return random.uniform(0, min(GEMINI_BACKOFF_MAX, GEMINI_BACKOFF_BASE * 2 ** attempt))
+
+
+async def post_gemini(payload: dict, url: str = API_URL, timeout: float | None = None) -> dict:
+    """POST a payload to Gemini and return the JSON body, retrying transient failures.
+
+    At most GEMINI_MAX_CONCURRENCY calls are in flight per worker; the rest
+    wait for a slot. Raises httpx.HTTPError once retries are exhausted.
+    """
+    client = get_client()
+    request_timeout = httpx.Timeout(timeout, connect=GEMINI_CONNECT_TIMEOUT) if timeout else client.timeout
+
+    async with _get_semaphore():
+        for attempt in range(GEMINI_MAX_RETRIES + 1):
+            try:
+                response = await client.post(url, json=payload, timeout=request_timeout)
+                if response.status_code in RETRY_STATUS_CODES and attempt < GEMINI_MAX_RETRIES:
+                    delay = _backoff(attempt, response.headers.get("Retry-After"))
+                    print(f"⚠️ Gemini returned {response.status_code}, retrying in {delay:.2f}s")
+                    await asyncio.sleep(delay)
+                    continue
+                response.raise_for_status()
+                return response.json()
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                if attempt >= GEMINI_MAX_RETRIES:
+                    raise
+                delay = _backoff(attempt)
+                print(f"⚠️ Gemini request failed ({type(e).__name__}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+
+def _payload_key(payload: dict) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def single_flight_stats() -> dict:
+    return {**_flight_stats, "in_flight": len(_inflight)}
+
+
+async def get_gemini_response_async(user_query: str, timeout: float | None = None, response_language: str | None = None,
+                                    history: list[dict] | None = None) -> str:
+    """
+    Async counterpart of `chatbot.app.get_gemini_response`, with the same
+    language handling and the same fallback messages on failure. Pass
+    `response_language` to skip detection when the caller already ran it,
+    and `history` (earlier `contents` entries) for a multi-turn request.
+
+    Concurrent calls with an identical payload share one upstream request
+    (the first caller's timeout applies); cancelling one caller does not
+    cancel the shared request.
+    """
+    payload = build_gemini_payload(user_query, response_language or detect_response_language(user_query), history)
+    key = _payload_key(payload)
+
+    task = _inflight.get(key)
+    if task is None:
+        _flight_stats["upstream_calls"] += 1
+        task = asyncio.ensure_future(_fetch_response(payload, timeout))
+        _inflight[key] = task
+        task.add_done_callback(lambda done: _inflight.pop(key, None) if _inflight.get(key) is done else None)
+    else:
+        _flight_stats["deduplicated_calls"] += 1
+    return await asyncio.shield(task)
+
+
+async def _fetch_response(payload: dict, timeout: float | None) -> str:
+    start = time.time()
+    try:
+        result = await post_gemini(payload, timeout=timeout)
+        return extract_response_text(result)
+    except httpx.HTTPError as e:
+        return f"An error occurred while connecting to the API: {e}"
+    except (ValueError, KeyError) as e:
+        return f"An error occurred while parsing the API response: {e}"
+    finally:
+        print(f"⏱️ Gemini round trip: {time.time() - start:.2f}s")
+
+
+def _chunk_text(chunk: dict) -> str:
+    parts = (chunk.get('candidates') or [{}])[0].get('content', {}).get('parts') or []
+    return "".join(part.get('text', '') for part in parts)
+
+
+async def stream_gemini_response(user_query: str, timeout: float | None = None, response_language: str | None = None,
+                                 history: list[dict] | None = None):
+    """
+    Streams the answer to `user_query` from streamGenerateContent, yielding
+    text fragments as they arrive. Transient failures are retried only
+    before the first fragment; later errors raise httpx.HTTPError.
+    """
+    payload = build_gemini_payload(user_query, response_language or detect_response_language(user_query), history)
+    client = get_client()
+    request_timeout = httpx.Timeout(timeout, connect=GEMINI_CONNECT_TIMEOUT) if timeout else client.timeout
+    start = time.time()
+
+    async with _get_semaphore():
+        for attempt in range(GEMINI_MAX_RETRIES + 1):
+            received = False
+            try:
+                async with client.stream("POST", API_STREAM_URL, json=payload, timeout=request_timeout) as response:
+                    if response.status_code in RETRY_STATUS_CODES and attempt < GEMINI_MAX_RETRIES:
+                        delay = _backoff(attempt, response.headers.get("Retry-After"))
+                        print(f"⚠️ Gemini stream returned {response.status_code}, retrying in {delay:.2f}s")
+                        await asyncio.sleep(delay)
+                        continue
+                    response.raise_for_status()
+
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        text = _chunk_text(json.loads(line[len("data:"):].strip()))
+                        if text:
+                            if not received:
+                                print(f"⏱️ Gemini time to first token: {time.time() - start:.2f}s")
+                            received = True
+                            yield text
+                print(f"⏱️ Gemini stream complete: {time.time() - start:.2f}s")
+                return
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                if received or attempt >= GEMINI_MAX_RETRIES:
+                    raise
+                delay = _backoff(attempt)
+                print(f"⚠️ Gemini stream failed ({type(e).__name__}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
@@ -0,0 +1,198 @@
+import datetime
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from auth.database import db
+from chatbot.app import is_gemini_error
+
+# Tunables (override via environment)
+CHAT_HISTORY_TURNS = int(os.getenv("CHAT_HISTORY_TURNS", "10"))  # turns kept per session
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "1500"))  # approx. tokens of history per request
+CHAT_HISTORY_SESSIONS = int(os.getenv("CHAT_HISTORY_SESSIONS", "5000"))  # hot sessions kept in memory
+CHAT_HISTORY_IDLE_TTL = int(os.getenv("CHAT_HISTORY_IDLE_TTL", "1800"))  # seconds before a hot session is reloaded
+
+# Share of the budget the one-line recap of dropped turns may use
+SUMMARY_SHARE = 0.2
+SUMMARY_PROMPT_CHARS = 80
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough Gemini token count (about 4 characters per token)."""
+    return math.ceil(len(text) / 4)
+
+
+def _stored_time(timestamp):
+    """`timestamp` as MongoDB stores it (millisecond precision), or None if it isn't a datetime."""
+    if not isinstance(timestamp, datetime.datetime):
+        return None
+    return timestamp.replace(microsecond=timestamp.microsecond // 1000 * 1000, tzinfo=None)
+
+
+def _clip(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+
+class ConversationHistory:
+    """Recent turns per chat session, for multi-turn Gemini requests.
+
+    Active sessions live in an in-memory ring buffer of the last `max_turns`
+    turns; a cold or idle session is reloaded from `chat_history` with one
+    query on the (session_id, timestamp) index. A session can move between
+    worker processes, so before a buffer is trusted the timestamp of the
+    session's newest saved turn is read from the same index: anything newer
+    than the buffer's own newest turn was written elsewhere, and the buffer
+    is reloaded. `context()` fits the turns
+    into `token_budget`: newest turns are kept whole and older ones are
+    folded into a one-line recap of what the user asked.
+    """
+
+    def __init__(self, collection, max_turns: int = CHAT_HISTORY_TURNS, token_budget: int = CHAT_HISTORY_TOKEN_BUDGET,
+                 max_sessions: int = CHAT_HISTORY_SESSIONS, idle_ttl: int = CHAT_HISTORY_IDLE_TTL):
+        self.collection = collection
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self._sessions = OrderedDict()  # session_id -> (last_used monotonic, deque of (prompt, response), newest timestamp)
+        self._indexes_ready = False
+
+        # Metrics
+        self.hot_hits = 0
+        self.db_loads = 0
+        self.stale_reloads = 0
+        self.trimmed_turns = 0
+
+    async def _ensure_indexes(self):
+        if self._indexes_ready:
+            return
+        try:
+            await self.collection.create_index([("session_id", 1), ("timestamp", -1)])
+            self._indexes_ready = True
+        except Exception as e:
+            print(f"❌ Chat history index error: {e}")
+
+    def _remember(self, session_id: str, turns: deque, newest):
+        self._sessions[session_id] = (time.monotonic(), turns, newest)
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    async def turns(self, session_id: str) -> list[tuple[str, str]]:
+        """Last `max_turns` (prompt, response) pairs of a session, oldest first."""
+        entry = self._sessions.get(session_id)
+        if entry and time.monotonic() - entry[0] < self.idle_ttl:
+            if await self._is_current(session_id, entry[2]):
+                self._remember(session_id, entry[1], entry[2])
+                self.hot_hits += 1
+                return list(entry[1])
+            self.stale_reloads += 1
+
+        await self._ensure_indexes()
+        turns = deque(maxlen=self.max_turns)
+        newest = None
+        try:
+            cursor = (
+                self.collection.find(
+                    {"session_id": session_id, "completed": {"$ne": False}},
+                    {"_id": 0, "prompt": 1, "response": 1, "timestamp": 1},
+                )
+                .sort("timestamp", -1)
+                .limit(self.max_turns)
+            )
+            docs = await cursor.to_list(length=self.max_turns)
+            newest = _stored_time(docs[0].get("timestamp")) if docs else None
+            turns.extend(
+                (doc["prompt"], doc["response"])
+                for doc in reversed(docs)
+                if doc.get("prompt") and not is_gemini_error(doc.get("response"))
+            )
+            self.db_loads += 1
+        except Exception as e:
+            print(f"❌ Chat history load error: {e}")
+        self._remember(session_id, turns, newest)
+        return list(turns)
+
+    async def _is_current(self, session_id: str, newest) -> bool:
+        """Whether no turn newer than `newest` has been saved for the session (by any worker)."""
+        try:
+            doc = await self.collection.find_one(
+                {"session_id": session_id, "completed": {"$ne": False}},
+                {"_id": 0, "timestamp": 1},
+                sort=[("timestamp", -1)],
+            )
+        except Exception as e:
+            print(f"❌ Chat history freshness check error: {e}")
+            return True  # Keep serving the buffer rather than failing the request
+        saved = _stored_time(doc.get("timestamp")) if doc else None
+        return saved is None or (newest is not None and saved <= newest)
+
+    def append(self, session_id: str, prompt: str, response: str, timestamp: datetime.datetime):
+        """Record a finished turn in the session's ring buffer.
+
+        The caller saves the turn to chat_history with the same `timestamp`,
+        which is how `turns()` tells this worker's writes from other workers'.
+        """
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return  # Not hot (or evicted): the next turns() call reloads it from chat_history
+        entry[1].append((prompt, response))
+        newest = _stored_time(timestamp)
+        self._remember(session_id, entry[1], newest if entry[2] is None else max(entry[2], newest))
+
+    def fit_to_budget(self, turns: list[tuple[str, str]]) -> tuple[list[tuple[str, str]], str | None]:
+        """Newest turns that fit the token budget, plus a recap of the older ones (or None)."""
+        summary_budget = int(self.token_budget * SUMMARY_SHARE)
+        remaining = self.token_budget - summary_budget
+        kept = []
+        for prompt, response in reversed(turns):
+            cost = estimate_tokens(prompt) + estimate_tokens(response)
+            if cost > remaining:
+                break
+            kept.append((prompt, response))
+            remaining -= cost
+        kept.reverse()
+
+        dropped = turns[:len(turns) - len(kept)]
+        if not dropped:
+            return kept, None
+        self.trimmed_turns += len(dropped)
+
+        summary = "Earlier in this conversation the user asked about: "
+        asked = []
+        for prompt, _ in reversed(dropped):
+            candidate = _clip(prompt, SUMMARY_PROMPT_CHARS)
+            if estimate_tokens(summary + "; ".join(asked + [candidate])) > summary_budget:
+                break
+            asked.append(candidate)
+        if not asked:
+            return kept, None
+        return kept, summary + "; ".join(reversed(asked))
+
+    async def context(self, session_id: str) -> list[dict]:
+        """Gemini `contents` entries for the session's history, within the token budget."""
+        kept, summary = self.fit_to_budget(await self.turns(session_id))
+        contents = []
+        if summary:
+            contents.append({"role": "user", "parts": [{"text": summary}]})
+            contents.append({"role": "model", "parts": [{"text": "Understood."}]})
+        for prompt, response in kept:
+            contents.append({"role": "user", "parts": [{"text": prompt}]})
+            contents.append({"role": "model", "parts": [{"text": response}]})
+        return contents
+
+    def stats(self) -> dict:
+        return {
+            "hot_sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "max_turns": self.max_turns,
+            "token_budget": self.token_budget,
+            "hot_hits": self.hot_hits,
+            "db_loads": self.db_loads,
+            "stale_reloads": self.stale_reloads,
+            "trimmed_turns": self.trimmed_turns,
+        }
+
+
+# Shared history for the chat routes
+conversation_history = ConversationHistory(db["chat_history"])
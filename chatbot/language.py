@@ -0,0 +1,119 @@
+import os
+import re
+import unicodedata
+from functools import lru_cache
+from langdetect import detect, DetectorFactory
+
+# Ensure consistent language detection
+DetectorFactory.seed = 0
+
+# Tunables (override via environment)
+LANG_DETECT_CACHE_SIZE = int(os.getenv("LANG_DETECT_CACHE_SIZE", "10000"))
+# Share of letters a script needs before the prompt is routed on script alone
+SCRIPT_DOMINANCE = float(os.getenv("LANG_SCRIPT_DOMINANCE", "0.6"))
+
+# Map detected language codes to human-readable language names
+LANG_NAMES = {
+    "en": "English",
+    "hi": "Hindi",
+    "pa": "Punjabi",
+}
+
+DEVANAGARI = range(0x0900, 0x0980)
+GURMUKHI = range(0x0A00, 0x0A80)
+
+# Romanized Hindi/Punjabi words that rarely appear in English prompts
+HINGLISH_LEXICON = (
+    "bhai", "yaar", "mix", "bol",  # original keyword list
+    "kya", "kyu", "kyun", "kaise", "kaisa", "kab", "kahan", "kitna", "kitni", "kitne", "kaun", "konsa",
+    "hai", "hain", "tha", "thi", "hoga", "hogi", "karo", "kare", "karna", "karein", "chahiye",
+    "mein", "mujhe", "mera", "meri", "humara", "hamara", "apna", "aur", "nahi", "nahin", "bhi",
+    "ko", "ki", "ka", "ke", "se", "wala", "wali", "ji", "khet", "fasal", "beej", "paani", "khad",
+    "dawai", "dawa", "rog", "keeda", "keede", "mitti", "barish", "kheti", "kisan", "sarson", "gehu",
+    "gehun", "dhan", "makka", "ganna", "kapas", "dale", "dalein", "daalna", "lagao", "lagaye",
+)
+HINGLISH_PATTERN = re.compile(r"\b(?:" + "|".join(sorted(HINGLISH_LEXICON, key=len, reverse=True)) + r")\b")
+# Words like "ko"/"ka"/"se" also occur in English text, so one hit is not enough on its own
+HINGLISH_STRONG = frozenset(("bhai", "yaar", "mix", "bol", "kya", "kaise", "kyun", "chahiye", "nahi", "nahin", "mujhe"))
+HINGLISH_MIN_HITS = 2
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def script_profile(text: str) -> tuple[int, int, int, int]:
+    """Letter counts per script: (devanagari, gurmukhi, latin, other)."""
+    devanagari = gurmukhi = latin = other = 0
+    for char in text:
+        if not char.isalpha():
+            continue
+        code = ord(char)
+        if code in DEVANAGARI:
+            devanagari += 1
+        elif code in GURMUKHI:
+            gurmukhi += 1
+        elif code < 0x0250:  # Basic Latin through Latin Extended-B
+            latin += 1
+        else:
+            other += 1
+    return devanagari, gurmukhi, latin, other
+
+
+def is_hinglish(lowered: str) -> bool:
+    if "hinglish" in lowered:
+        return True
+    hits = HINGLISH_PATTERN.findall(lowered)
+    return len(hits) >= HINGLISH_MIN_HITS or any(hit in HINGLISH_STRONG for hit in hits)
+
+
+def statistical_language(text: str) -> str:
+    """langdetect fallback for prompts the script and lexicon checks cannot settle."""
+    try:
+        detected_lang = detect(text)
+    except Exception:
+        detected_lang = "en"  # Fallback to English if detection fails
+    return LANG_NAMES.get(detected_lang, "English")  # Default to English if language not in map
+
+
+@lru_cache(maxsize=LANG_DETECT_CACHE_SIZE)
+def _route(normalized: str) -> str:
+    devanagari, gurmukhi, latin, other = script_profile(normalized)
+    letters = devanagari + gurmukhi + latin + other
+    if not letters:
+        return "English"
+
+    if devanagari / letters >= SCRIPT_DOMINANCE:
+        return "Hinglish" if latin and is_hinglish(normalized) else "Hindi"
+    if gurmukhi / letters >= SCRIPT_DOMINANCE:
+        return "Punjabi"
+    if latin / letters >= SCRIPT_DOMINANCE:
+        return "Hinglish" if is_hinglish(normalized) else "English"
+
+    # Mixed or unfamiliar scripts: let the statistical detector decide
+    detected = statistical_language(normalized)
+    if detected in ("Hindi", "English") and is_hinglish(normalized):
+        return "Hinglish"
+    return detected
+
+
+def detect_language(user_query: str) -> str:
+    """
+    Response language for a prompt: "English", "Hindi", "Punjabi" or "Hinglish".
+
+    Devanagari and Gurmukhi prompts are routed on script, Latin prompts on
+    the Hinglish lexicon; only mixed-script input reaches langdetect.
+    Results are memoized on the case- and spacing-normalized prompt.
+    """
+    normalized = _WHITESPACE.sub(" ", unicodedata.normalize("NFC", user_query)).strip().lower()
+    return _route(normalized)
+
+
+def detection_stats() -> dict:
+    info = _route.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "cached": info.currsize,
+        "max_cached": info.maxsize,
+        "hits": info.hits,
+        "misses": info.misses,
+        "hit_rate": (info.hits / lookups) if lookups else 0.0,
+    }
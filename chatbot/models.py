@@ -4,6 +4,9 @@ from fastapi import UploadFile
 
 class ChatRequest(BaseModel):
     prompt: str
+    no_cache: bool = False  # Skip the response cache and ask Gemini afresh
+    session_id: Optional[str] = None  # Continue this conversation; earlier turns are sent as context
+    user_id: Optional[str] = None
 
 
 class DashboardResponse(BaseModel):
@@ -12,6 +15,7 @@ class DashboardResponse(BaseModel):
     weather: dict | None = None
     news: list[dict] | None = None
     market_prices: list[dict] | None = None
+    status: dict | None = None  # Per-section {"status": ok | error | timeout | skipped, "ms": ...}
 
 class VoiceChatRequest(BaseModel):
     audio: UploadFile  # Audio file (e.g., WAV/MP3)
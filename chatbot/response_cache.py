@@ -0,0 +1,185 @@
+import os
+import re
+import time
+import unicodedata
+from collections import OrderedDict, defaultdict
+from chatbot.app import detect_response_language, is_gemini_error
+from chatbot.gemini_client import get_gemini_response_async
+
+# Tunables (override via environment)
+CHAT_CACHE_ENABLED = os.getenv("CHAT_CACHE_ENABLED", "true").lower() == "true"
+CHAT_CACHE_SIZE = int(os.getenv("CHAT_CACHE_SIZE", "5000"))
+CHAT_CACHE_TTL = int(os.getenv("CHAT_CACHE_TTL", "86400"))  # seconds
+CHAT_CACHE_SIMILARITY = os.getenv("CHAT_CACHE_SIMILARITY", "false").lower() == "true"
+CHAT_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("CHAT_CACHE_SIMILARITY_THRESHOLD", "0.9"))
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+# Words a rephrasing may add, drop or swap without changing the question. Crop,
+# chemical and place names, question words and negations (not, no, don, nahi,
+# mat, ...) are deliberately absent, so a similarity hit must agree on all of them.
+FILLER_WORDS = frozenset("""
+a an the i me my we our us you your it this that please kindly tell
+is are am was be do does can could should would will shall to of for in on at with about
+ji sir bhai bhaiya hai hain ho ka ki ke ko se me mein mera meri mere mujhe main hum hamara
+kripya batao bataye bataiye btao
+""".split())
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Case-, punctuation- and spacing-insensitive form of a prompt ("Wheat me urea kab dale??" -> "wheat me urea kab dale")."""
+    text = unicodedata.normalize("NFKC", prompt).lower()
+    text = _PUNCTUATION.sub(" ", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def content_tokens(text: str) -> frozenset[str]:
+    """Words of a normalized prompt that carry its meaning (everything but FILLER_WORDS)."""
+    return frozenset(word for word in text.split() if word not in FILLER_WORDS)
+
+
+def char_ngrams(text: str, n: int = 3) -> set[str]:
+    padded = f" {text} "
+    return {padded[i:i + n] for i in range(max(1, len(padded) - n + 1))}
+
+
+class ResponseCache:
+    """LRU/TTL cache of Gemini answers keyed by (response language, normalized prompt).
+
+    Exact tier: dictionary lookup on the normalized prompt. Similarity tier
+    (optional): character-trigram Jaccard similarity against cached prompts
+    of the same language that share at least one trigram, found through an
+    inverted index; the best match at or above `threshold` is a hit, but
+    only if both prompts have the same `content_tokens`. Trigram overlap
+    alone can't tell "spray" from "not spray" or "tomato" from "potato".
+    """
+
+    def __init__(self, max_entries: int = CHAT_CACHE_SIZE, ttl_seconds: int = CHAT_CACHE_TTL,
+                 similarity: bool = CHAT_CACHE_SIMILARITY, threshold: float = CHAT_CACHE_SIMILARITY_THRESHOLD):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity = similarity
+        self.threshold = threshold
+        self._entries = OrderedDict()  # (lang, normalized) -> (expires_at, response, ngrams, content tokens)
+        self._index = defaultdict(set)  # (lang, ngram) -> {(lang, normalized)}
+
+        # Metrics
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    def _evict(self, key):
+        _, _, ngrams, _ = self._entries.pop(key)
+        lang = key[0]
+        for ngram in ngrams:
+            keys = self._index.get((lang, ngram))
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._index[(lang, ngram)]
+
+    def _lookup_similar(self, lang: str, normalized: str):
+        ngrams = char_ngrams(normalized)
+        content = content_tokens(normalized)
+        overlap = defaultdict(int)
+        for ngram in ngrams:
+            for key in self._index.get((lang, ngram), ()):
+                overlap[key] += 1
+
+        best_key, best_score = None, 0.0
+        for key, shared in overlap.items():
+            _, _, other, other_content = self._entries[key]
+            if other_content != content:
+                continue
+            score = shared / (len(ngrams) + len(other) - shared)
+            if score > best_score:
+                best_key, best_score = key, score
+        if best_key is not None and best_score >= self.threshold:
+            return best_key, best_score
+        return None, best_score
+
+    def get(self, prompt: str, lang: str):
+        normalized = normalize_prompt(prompt)
+        key = (lang, normalized)
+        now = time.monotonic()
+
+        entry = self._entries.get(key)
+        if entry and entry[0] <= now:
+            self._evict(key)
+            entry = None
+        if entry:
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return entry[1]
+
+        if self.similarity:
+            match, score = self._lookup_similar(lang, normalized)
+            if match is not None:
+                expires_at, response, _, _ = self._entries[match]
+                if expires_at > now:
+                    self._entries.move_to_end(match)
+                    self.similar_hits += 1
+                    print(f"✅ Chat cache similarity hit ({score:.2f}): '{normalized}' ~ '{match[1]}'")
+                    return response
+                self._evict(match)
+
+        self.misses += 1
+        return None
+
+    def set(self, prompt: str, lang: str, response: str):
+        normalized = normalize_prompt(prompt)
+        key = (lang, normalized)
+        if key in self._entries:
+            self._evict(key)
+        ngrams = char_ngrams(normalized) if self.similarity else set()
+        content = content_tokens(normalized) if self.similarity else frozenset()
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, response, ngrams, content)
+        for ngram in ngrams:
+            self._index[(lang, ngram)].add(key)
+        while len(self._entries) > self.max_entries:
+            self._evict(next(iter(self._entries)))
+
+    def stats(self) -> dict:
+        hits = self.exact_hits + self.similar_hits
+        lookups = hits + self.misses
+        return {
+            "enabled": CHAT_CACHE_ENABLED,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "similarity_tier": self.similarity,
+            "similarity_threshold": self.threshold,
+            "exact_hits": self.exact_hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": (hits / lookups) if lookups else 0.0,
+        }
+
+
+# Shared cache for the chat routes
+response_cache = ResponseCache()
+
+
+async def get_cached_gemini_response(user_query: str, bypass: bool = False) -> str:
+    """get_gemini_response_async behind the response cache.
+
+    `bypass` skips the lookup and forces a fresh Gemini call (whose answer still refreshes the cache).
+    """
+    response_language = detect_response_language(user_query)
+    if not CHAT_CACHE_ENABLED:
+        return await get_gemini_response_async(user_query, response_language=response_language)
+
+    if bypass:
+        response_cache.bypassed += 1
+    else:
+        cached = response_cache.get(user_query, response_language)
+        if cached is not None:
+            return cached
+
+    response = await get_gemini_response_async(user_query, response_language=response_language)
+    if not is_gemini_error(response):
+        response_cache.set(user_query, response_language, response)
+    return response
@@ -1,22 +1,41 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File
+from fastapi import APIRouter, HTTPException, UploadFile, File, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+import asyncio
 import traceback
+import json
+from bson import ObjectId
+from bson.errors import InvalidId
 from chatbot.models import ChatRequest, VoiceChatRequest
 from auth.database import db  # Reuse MongoDB for chat history
 import datetime
-import shutil
-import uuid
-import os
-from chatbot.app import get_gemini_response, transcribe_audio
-from image_analysis.voice_helper import generate_voice  # Reuse TTS from image analysis
+from chatbot.app import transcribe_audio_async, detect_response_language, is_gemini_error
+from chatbot.gemini_client import get_gemini_response_async, stream_gemini_response, single_flight_stats
+from chatbot.language import detection_stats
+from chatbot.history import conversation_history
+from chatbot.stt import get_stt_backend, STT_LANGUAGE
+from chatbot.response_cache import response_cache, get_cached_gemini_response, CHAT_CACHE_ENABLED
+from image_analysis.voice_helper import tts_cache  # Reuse TTS from image analysis
+from image_analysis.voice_chunks import generate_long_voice, iter_voice_chunks, stitch_segments, read_voice
 
 router = APIRouter()
 
-UPLOAD_AUDIO_DIR = "uploadaudio"
-os.makedirs(UPLOAD_AUDIO_DIR, exist_ok=True)
+async def get_general_ai_response(prompt: str, no_cache: bool = False, session_id: str | None = None,
+                                  timestamp: datetime.datetime | None = None) -> str:
+    """General AI response using Gemini (non-agri fallback if needed), answered from the response cache when possible.
 
-def get_general_ai_response(prompt: str) -> str:
-    """General AI response using Gemini (non-agri fallback if needed)."""
-    return get_gemini_response(prompt)  # Direct call, no wrapping
+    With a `session_id`, earlier turns of the conversation are sent as context
+    and the answer is recorded in the session under `timestamp`, which the
+    caller must also save the turn with; such context-dependent answers
+    bypass the response cache.
+    """
+    history = await conversation_history.context(session_id) if session_id else []
+    if history:
+        response = await get_gemini_response_async(prompt, history=history)
+    else:
+        response = await get_cached_gemini_response(prompt, bypass=no_cache)
+    if session_id and not is_gemini_error(response):
+        conversation_history.append(session_id, prompt, response, timestamp or datetime.datetime.now())
+    return response
 
 async def save_chat_to_db(chat_data: dict):
     """Async helper to save chat to MongoDB."""
@@ -29,35 +48,110 @@ async def save_chat_to_db(chat_data: dict):
 @router.post("/general")
 async def general_chat(request: ChatRequest):
     try:
-        response = get_general_ai_response(request.prompt)
+        timestamp = datetime.datetime.now()
+        response = await get_general_ai_response(request.prompt, no_cache=request.no_cache, session_id=request.session_id,
+                                                 timestamp=timestamp)
         # Store in MongoDB (simplified, no translation fields)
-        await db["chat_history"].insert_one({
+        result = await db["chat_history"].insert_one({
             "type": "general",
             "prompt": request.prompt,
             "response": response,
-            "timestamp": datetime.datetime.now()
+            "session_id": request.session_id,
+            "user_id": request.user_id,
+            "timestamp": timestamp
         })
-        return {"response": response}
+        # chat_id lets the client have the answer spoken via /chat/tts/stream
+        return {"response": response, "session_id": request.session_id, "chat_id": str(result.inserted_id)}
     except Exception as e:
         print(f"Error in /chat/general: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+def sse_event(event: str, data: dict) -> str:
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("/general/stream")
+async def general_chat_stream(request: ChatRequest):
+    """Same as /general, but relays Gemini's answer over SSE as it is generated.
+
+    Emits `token` events with text fragments, then one `done` event with
+    the full response (or an `error` event). The transcript is saved to
+    chat_history once the stream ends.
+    """
+    response_language = detect_response_language(request.prompt)
+    history = await conversation_history.context(request.session_id) if request.session_id else []
+    use_cache = CHAT_CACHE_ENABLED and not request.no_cache and not history
+    chat_id = ObjectId()  # known up front so the `done` event can carry it
+
+    async def event_stream():
+        fragments = []
+        error = None
+        cached = response_cache.get(request.prompt, response_language) if use_cache else None
+        try:
+            if cached is not None:
+                fragments.append(cached)
+                yield sse_event("token", {"text": cached})
+            else:
+                async for text in stream_gemini_response(request.prompt, response_language=response_language, history=history):
+                    fragments.append(text)
+                    yield sse_event("token", {"text": text})
+        except Exception as e:
+            print(f"Error in /chat/general/stream: {traceback.format_exc()}")
+            error = f"An error occurred while connecting to the API: {e}"
+
+        response = "".join(fragments)
+        timestamp = datetime.datetime.now()
+        if error:
+            yield sse_event("error", {"detail": error, "partial_response": response})
+        else:
+            if not response:
+                response = "Sorry, I couldn't get a response. Please try again."
+            else:
+                if cached is None and CHAT_CACHE_ENABLED and not history:
+                    response_cache.set(request.prompt, response_language, response)
+                if request.session_id:
+                    conversation_history.append(request.session_id, request.prompt, response, timestamp)
+            yield sse_event("done", {"response": response, "cached": cached is not None, "session_id": request.session_id,
+                                     "chat_id": str(chat_id)})
+
+        await save_chat_to_db({
+            "_id": chat_id,
+            "type": "general",
+            "prompt": request.prompt,
+            "response": response,
+            "session_id": request.session_id,
+            "user_id": request.user_id,
+            "streamed": True,
+            "completed": error is None,
+            "timestamp": timestamp
+        })
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/cache-stats")
+async def cache_stats():
+    """Hit rates of the chat caches and Gemini calls saved by request coalescing."""
+    return {
+        **response_cache.stats(),
+        "single_flight": single_flight_stats(),
+        "language_detection": detection_stats(),
+        "conversation_history": conversation_history.stats(),
+        "tts_cache": tts_cache.stats(),
+    }
+
 @router.post("/voice_chat")
 async def voice_chat(audio: UploadFile = File(..., description="Audio file (WAV/MP3, <60s)")):
     try:
         if audio.content_type not in ["audio/wav", "audio/mpeg", "audio/mp3"]:
             raise HTTPException(status_code=400, detail="Only WAV/MP3 audio supported")
 
-        # Save uploaded audio temporarily
-        filename = f"temp_audio_{uuid.uuid4().hex}.{audio.filename.split('.')[-1]}"
-        audio_path = os.path.join(UPLOAD_AUDIO_DIR, filename)
-        with open(audio_path, "wb") as buffer:
-            shutil.copyfileobj(audio.file, buffer)
-
-        # Transcribe audio to text + detect language
-        with open(audio_path, "rb") as f:
-            audio_content = f.read()
-        transcript, detected_lang = transcribe_audio(audio_content)
+        # Transcribe audio to text + detect language (the upload stays in memory)
+        audio_content = await audio.read()
+        transcript, detected_lang = await transcribe_audio_async(audio_content)
 
         if "failed" in transcript.lower():
             raise HTTPException(status_code=400, detail="Audio transcription failed. Please try clearer speech.")
@@ -65,15 +159,18 @@ async def voice_chat(audio: UploadFile = File(..., description="Audio file (WAV/
         print(f"🔍 Transcribed: '{transcript}' (Detected lang: {detected_lang})")
 
         # Get Gemini response in detected language
-        response = get_general_ai_response(transcript)  # Use general endpoint logic
+        response = await get_general_ai_response(transcript)  # Use general endpoint logic
 
         # Generate voice response in detected language with SSML for better pronunciation
-        voice_filename = generate_voice(
+        # (sentence chunks are synthesized in parallel, then stitched)
+        voice = await generate_long_voice(
             response,
             lang=detected_lang.split('-')[0],
             use_ssml=True,
             custom_rate=0.95
         )
+        voice_filename = voice["voice_file"] if voice else None
+        playlist_filename = voice["playlist_file"] if voice else None
 
         # Save to DB
         chat_data = {
@@ -86,16 +183,143 @@ async def voice_chat(audio: UploadFile = File(..., description="Audio file (WAV/
         }
         await save_chat_to_db(chat_data)
 
-        # Clean up temp audio
-        os.remove(audio_path)
-
         return {
             "transcript": transcript,
             "detected_language": detected_lang,
             "response_text": response,
             "voice_url": f"/uploadvoices/{voice_filename}" if voice_filename else None,
+            "playlist_url": f"/uploadvoices/{playlist_filename}" if playlist_filename else None,
             "timestamp": str(datetime.datetime.now())
         }
     except Exception as e:
         print(f"Error in /voice_chat: {traceback.format_exc()}")
-        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@router.websocket("/voice_stream")
+async def voice_stream(websocket: WebSocket, lang: str = STT_LANGUAGE, session_id: str | None = None, voice: bool = True):
+    """Streaming counterpart of /voice_chat.
+
+    The client sends LINEAR16 audio (STT_SAMPLE_RATE Hz) as binary frames and
+    may send the text frame "end" when the user stops talking. The server
+    replies with JSON messages: `interim` transcripts while audio arrives, one
+    `final` transcript, then `response` (and, when requested, a `voice_chunk`
+    per synthesized sentence chunk followed by the stitched `voice`) or `error`.
+    The Gemini call starts as soon as the final transcript lands.
+    """
+    await websocket.accept()
+    audio_queue = asyncio.Queue()
+
+    async def receive_audio():
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes"):
+                    await audio_queue.put(message["bytes"])
+                elif message.get("text") == "end":
+                    break
+        finally:
+            await audio_queue.put(None)
+
+    async def audio_chunks():
+        while (chunk := await audio_queue.get()) is not None:
+            yield chunk
+
+    receiver = asyncio.create_task(receive_audio())
+    try:
+        final = None
+        recognition = get_stt_backend().stream(audio_chunks(), lang)
+        try:
+            async for result in recognition:
+                if result["is_final"]:
+                    final = result
+                    break
+                await websocket.send_json({"event": "interim", "transcript": result["transcript"]})
+        finally:
+            await recognition.aclose()
+        receiver.cancel()
+
+        if not final or not final["transcript"].strip():
+            await websocket.send_json({"event": "error", "detail": "No speech detected. Please try clearer speech."})
+            return
+
+        transcript, detected_lang = final["transcript"], final["language"]
+        await websocket.send_json({"event": "final", "transcript": transcript, "language": detected_lang})
+        print(f"🔍 Transcribed (stream): '{transcript}' (Detected lang: {detected_lang})")
+
+        timestamp = datetime.datetime.now()
+        response = await get_general_ai_response(transcript, session_id=session_id, timestamp=timestamp)
+        await websocket.send_json({"event": "response", "response_text": response})
+
+        voice_filename = None
+        if voice and not is_gemini_error(response):
+            # Each sentence chunk is announced as soon as it is synthesized, so playback can start early
+            segments = []
+            async for segment in iter_voice_chunks(
+                response,
+                lang=detected_lang.split('-')[0].lower(),
+                use_ssml=True,
+                custom_rate=0.95
+            ):
+                if segment is None:
+                    break
+                segments.append(segment)
+                await websocket.send_json({"event": "voice_chunk", "index": len(segments) - 1, "voice_url": f"/uploadvoices/{segment}"})
+            stitched = await asyncio.to_thread(stitch_segments, segments) if segments else None
+            voice_filename = stitched["voice_file"] if stitched else None
+            await websocket.send_json({
+                "event": "voice",
+                "voice_url": f"/uploadvoices/{voice_filename}" if voice_filename else None,
+                "playlist_url": f"/uploadvoices/{stitched['playlist_file']}" if stitched and stitched["playlist_file"] else None,
+            })
+
+        await save_chat_to_db({
+            "type": "voice_chat",
+            "transcript": transcript,
+            "detected_lang": detected_lang,
+            "response": response,
+            "voice_file": voice_filename,
+            "session_id": session_id,
+            "streamed": True,
+            "timestamp": timestamp
+        })
+    except WebSocketDisconnect:
+        print("ℹ️ /voice_stream client disconnected")
+    except Exception as e:
+        print(f"Error in /voice_stream: {traceback.format_exc()}")
+        try:
+            await websocket.send_json({"event": "error", "detail": f"Internal server error: {str(e)}"})
+        except Exception:
+            pass
+    finally:
+        receiver.cancel()
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+
+@router.get("/tts/stream")
+async def tts_stream(
+    chat_id: str = Query(..., description="chat_id returned by /chat/general or /chat/general/stream"),
+    lang: str = Query("hi", description="Language: 'hi' for Hinglish, 'en' for English, 'pa' for Punjabi")
+):
+    """Speak a stored chat answer as one MP3 stream; bytes start flowing once the first sentence is synthesized.
+
+    Only answers this server generated can be spoken, so the endpoint can't be used to run arbitrary text through TTS.
+    """
+    try:
+        chat = await db["chat_history"].find_one({"_id": ObjectId(chat_id)}, {"response": 1})
+    except InvalidId:
+        chat = None
+    text = (chat or {}).get("response")
+    if not text or is_gemini_error(text):
+        raise HTTPException(status_code=404, detail="Chat response not found")
+
+    async def audio_stream():
+        async for segment in iter_voice_chunks(text, lang=lang.lower(), use_ssml=True, custom_rate=0.95):
+            if segment is None:
+                break
+            yield await asyncio.to_thread(read_voice, segment)
+
+    return StreamingResponse(audio_stream(), media_type="audio/mpeg", headers={"Cache-Control": "no-cache"})
@@ -0,0 +1,130 @@
+import asyncio
+import os
+import queue
+import threading
+from typing import AsyncIterator
+from google.cloud import speech_v1p1beta1 as speech
+from chatbot.app import get_speech_client
+
+# Tunables (override via environment)
+STT_BACKEND = os.getenv("STT_BACKEND", "google")  # google | stub
+STT_SAMPLE_RATE = int(os.getenv("STT_SAMPLE_RATE", "16000"))  # LINEAR16 audio from the client
+STT_LANGUAGE = os.getenv("STT_LANGUAGE", "hi-IN")
+STT_STUB_TRANSCRIPT = os.getenv("STT_STUB_TRANSCRIPT")  # stub backend: fixed final transcript
+
+
+def transcript_event(transcript: str, is_final: bool, language: str) -> dict:
+    return {"transcript": transcript, "is_final": is_final, "language": language}
+
+
+class GoogleStreamingSTT:
+    """Google Cloud streaming recognition over one shared SpeechClient.
+
+    The gRPC stream is blocking, so each recognition runs on its own thread;
+    audio chunks go to it through a queue and results come back to the event
+    loop as `transcript_event` dicts (interim results included). The stream
+    ends after the first utterance.
+    """
+
+    name = "google"
+
+    def __init__(self, sample_rate: int = STT_SAMPLE_RATE):
+        self.sample_rate = sample_rate
+
+    def _streaming_config(self, language_code: str):
+        return speech.StreamingRecognitionConfig(
+            config=speech.RecognitionConfig(
+                encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+                sample_rate_hertz=self.sample_rate,
+                language_code=language_code,
+                enable_automatic_punctuation=True,
+                use_enhanced=True,
+            ),
+            interim_results=True,
+            single_utterance=True,
+        )
+
+    async def stream(self, chunks: AsyncIterator[bytes], language_code: str = STT_LANGUAGE) -> AsyncIterator[dict]:
+        loop = asyncio.get_running_loop()
+        client = get_speech_client()
+        streaming_config = self._streaming_config(language_code)
+        audio = queue.Queue()
+        results = asyncio.Queue()
+
+        def requests():
+            while (chunk := audio.get()) is not None:
+                yield speech.StreamingRecognizeRequest(audio_content=chunk)
+
+        def recognize():
+            try:
+                for response in client.streaming_recognize(config=streaming_config, requests=requests()):
+                    for result in response.results:
+                        if result.alternatives:
+                            event = transcript_event(
+                                result.alternatives[0].transcript,
+                                result.is_final,
+                                result.language_code or language_code,
+                            )
+                            loop.call_soon_threadsafe(results.put_nowait, event)
+            except Exception as e:
+                loop.call_soon_threadsafe(results.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(results.put_nowait, None)
+
+        async def feed():
+            try:
+                async for chunk in chunks:
+                    audio.put(chunk)
+            finally:
+                audio.put(None)
+
+        threading.Thread(target=recognize, name="stt-stream", daemon=True).start()
+        feeder = asyncio.create_task(feed())
+        try:
+            while (item := await results.get()) is not None:
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            feeder.cancel()
+            audio.put(None)  # Ends the request stream if the caller stopped early
+
+
+class StubSTT:
+    """Local stand-in for tests: each audio chunk is read as UTF-8 text.
+
+    Yields the text received so far as interim results, then a final result
+    (STT_STUB_TRANSCRIPT if set) once the audio ends.
+    """
+
+    name = "stub"
+
+    def __init__(self, transcript: str | None = STT_STUB_TRANSCRIPT):
+        self.transcript = transcript
+
+    async def stream(self, chunks: AsyncIterator[bytes], language_code: str = STT_LANGUAGE) -> AsyncIterator[dict]:
+        words = []
+        async for chunk in chunks:
+            text = chunk.decode("utf-8", errors="ignore").strip()
+            if text:
+                words.append(text)
+                yield transcript_event(" ".join(words), False, language_code)
+        yield transcript_event(self.transcript or " ".join(words), True, language_code)
+
+
+STT_BACKENDS = {backend.name: backend for backend in (GoogleStreamingSTT, StubSTT)}
+
+_backend = None
+
+
+def get_stt_backend():
+    """Shared STT_BACKEND instance, created on first use."""
+    global _backend
+    if _backend is None:
+        name = STT_BACKEND.lower()
+        if name not in STT_BACKENDS:
+            print(f"⚠️ Unknown STT backend '{name}', using google")
+            name = GoogleStreamingSTT.name
+        _backend = STT_BACKENDS[name]()
+        print(f"✅ STT backend: {name}")
+    return _backend
@@ -0,0 +1,92 @@
+import asyncio
+import itertools
+import os
+import threading
+import time
+from google.cloud import texttospeech
+from google.cloud import speech_v1p1beta1 as speech
+
+# Tunables (override via environment)
+CLOUD_CLIENT_POOL_SIZE = int(os.getenv("CLOUD_CLIENT_POOL_SIZE", "1"))  # gRPC channels per client kind
+CLOUD_CLIENT_PRELOAD = os.getenv("CLOUD_CLIENT_PRELOAD", "false").lower() == "true"
+
+# kind -> (sync client class, async client class)
+CLIENT_FACTORIES = {
+    "tts": (texttospeech.TextToSpeechClient, texttospeech.TextToSpeechAsyncClient),
+    "stt": (speech.SpeechClient, speech.SpeechAsyncClient),
+}
+
+
+class ClientRegistry:
+    """Process-wide Google Cloud clients, built once per kind and shared.
+
+    Each client owns one gRPC channel, which is thread-safe and multiplexes
+    concurrent calls, so requests share `pool_size` clients (handed out
+    round-robin) instead of paying credential loading, channel setup and a
+    TLS handshake each time. Async clients are bound to the running event
+    loop and kept in a separate pool. Setup time is logged and accumulated
+    per kind.
+    """
+
+    def __init__(self, factories: dict = CLIENT_FACTORIES, pool_size: int = CLOUD_CLIENT_POOL_SIZE):
+        self.factories = factories
+        self.pool_size = max(1, pool_size)
+        self._pools = {}  # (kind, is_async) -> (clients, round-robin cycle)
+        self._lock = threading.Lock()
+        self.setup_seconds = {}
+
+    def _pool(self, kind: str, is_async: bool):
+        key = (kind, is_async)
+        with self._lock:
+            if key not in self._pools:
+                factory = self.factories[kind][1 if is_async else 0]
+                label = f"{kind}_async" if is_async else kind
+                start = time.perf_counter()
+                clients = [factory() for _ in range(self.pool_size)]
+                elapsed = time.perf_counter() - start
+                self.setup_seconds[label] = self.setup_seconds.get(label, 0.0) + elapsed
+                print(f"⏱️ {label} client setup ({self.pool_size} channel(s)): {elapsed:.2f}s")
+                self._pools[key] = (clients, itertools.cycle(clients))
+            return next(self._pools[key][1])
+
+    def get(self, kind: str):
+        """Shared synchronous client of `kind` ("tts" or "stt")."""
+        return self._pool(kind, False)
+
+    def get_async(self, kind: str):
+        """Shared asyncio client of `kind`; call from the event loop that will use it."""
+        return self._pool(kind, True)
+
+    async def preload(self, kinds=None):
+        """Build the synchronous clients ahead of the first request."""
+        for kind in kinds or self.factories:
+            try:
+                await asyncio.to_thread(self.get, kind)
+            except Exception as e:
+                print(f"❌ {kind} client setup failed: {e}")
+
+    async def close(self):
+        with self._lock:
+            pools, self._pools = self._pools, {}
+        for (kind, is_async), (clients, _) in pools.items():
+            for client in clients:
+                try:
+                    if is_async:
+                        await client.transport.close()
+                    else:
+                        client.transport.close()
+                except Exception as e:
+                    print(f"❌ Error closing {kind} client: {e}")
+        if pools:
+            print("✅ Cloud clients closed")
+
+    def stats(self) -> dict:
+        return {
+            "pool_size": self.pool_size,
+            "clients": sorted(f"{kind}_async" if is_async else kind for kind, is_async in self._pools),
+            "setup_seconds": {label: round(seconds, 3) for label, seconds in self.setup_seconds.items()},
+        }
+
+
+# Shared registry for the TTS and STT helpers
+client_registry = ClientRegistry()
@@ -0,0 +1,154 @@
+import os
+import queue
+import numpy as np
+import tensorflow as tf
+
+# Backend selection (override via environment): keras | tf_function | tflite
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "keras").lower()
+TFLITE_MODEL_PATH = os.getenv("TFLITE_MODEL_PATH", "image_analysis/plant_disease_recog_model_pwp.tflite")
+TFLITE_POOL_SIZE = int(os.getenv("TFLITE_POOL_SIZE", "2"))
+TFLITE_NUM_THREADS = int(os.getenv("TFLITE_NUM_THREADS", "0")) or None
+
+# Model variant: float32 (Keras model) or a quantized TFLite build from image_analysis/quantize.py
+MODEL_VARIANT = os.getenv("INFERENCE_MODEL_VARIANT", "float32").lower()
+QUANTIZED_MODEL_PATHS = {
+    "float16": "image_analysis/plant_disease_recog_model_pwp_float16.tflite",
+    "int8": "image_analysis/plant_disease_recog_model_pwp_int8.tflite",
+}
+
+INPUT_SHAPE = (224, 224, 3)
+
+
+class KerasPredictBackend:
+    """Original path: `model.predict`, which sets up a tf.data pipeline per call."""
+    name = "keras"
+
+    def __init__(self, model):
+        self.model = model
+
+    def predict(self, img_batch: np.ndarray) -> np.ndarray:
+        return self.model.predict(img_batch, verbose=0)
+
+
+class TFFunctionBackend:
+    """Direct model call traced once with `tf.function` and a fixed input signature.
+
+    The batch dimension is left open so the batching scheduler reuses the
+    same concrete function for every batch size.
+    """
+    name = "tf_function"
+
+    def __init__(self, model):
+        self.model = model
+        self._forward = tf.function(
+            lambda x: model(x, training=False),
+            input_signature=[tf.TensorSpec(shape=(None, *INPUT_SHAPE), dtype=tf.float32)],
+        )
+
+    def predict(self, img_batch: np.ndarray) -> np.ndarray:
+        return self._forward(tf.convert_to_tensor(img_batch, dtype=tf.float32)).numpy()
+
+
+def convert_to_tflite(model, output_path: str, optimizations=None, representative_dataset=None, supported_types=None) -> str:
+    """Convert a Keras model to a TFLite flatbuffer and write it to `output_path`."""
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if optimizations:
+        converter.optimizations = optimizations
+    if representative_dataset is not None:
+        converter.representative_dataset = representative_dataset
+    if supported_types:
+        converter.target_spec.supported_types = supported_types
+    tflite_model = converter.convert()
+    with open(output_path, "wb") as f:
+        f.write(tflite_model)
+    print(f"✅ TFLite model written: {output_path} ({len(tflite_model) / 1e6:.1f} MB)")
+    return output_path
+
+
+def _quantize(img_batch: np.ndarray, details: dict) -> np.ndarray:
+    """Map float input onto an integer input tensor (full-integer int8 builds)."""
+    dtype = details["dtype"]
+    if not np.issubdtype(dtype, np.integer):
+        return img_batch.astype(dtype, copy=False)
+    scale, zero_point = details["quantization"]
+    info = np.iinfo(dtype)
+    return np.clip(np.round(img_batch / scale + zero_point), info.min, info.max).astype(dtype)
+
+
+def _dequantize(output: np.ndarray, details: dict) -> np.ndarray:
+    if not np.issubdtype(details["dtype"], np.integer):
+        return output.copy()
+    scale, zero_point = details["quantization"]
+    return (output.astype(np.float32) - zero_point) * scale
+
+
+class TFLiteBackend:
+    """Pool of TFLite interpreters; each call borrows one, so threads never share an interpreter."""
+    name = "tflite"
+
+    def __init__(self, model_path: str = TFLITE_MODEL_PATH, pool_size: int = TFLITE_POOL_SIZE, model=None):
+        if not os.path.exists(model_path):
+            if model is None:
+                raise FileNotFoundError(f"TFLite model not found: {model_path}")
+            print(f"ℹ️ {model_path} missing, converting from the Keras model")
+            convert_to_tflite(model, model_path)
+
+        self.model_path = model_path
+        self._pool = queue.Queue()
+        for _ in range(max(1, pool_size)):
+            interpreter = tf.lite.Interpreter(model_path=model_path, num_threads=TFLITE_NUM_THREADS)
+            interpreter.allocate_tensors()
+            self._pool.put(interpreter)
+
+    def predict(self, img_batch: np.ndarray) -> np.ndarray:
+        interpreter = self._pool.get()
+        try:
+            input_details = interpreter.get_input_details()[0]
+            if tuple(input_details["shape"]) != img_batch.shape:
+                interpreter.resize_tensor_input(input_details["index"], img_batch.shape)
+                interpreter.allocate_tensors()
+            interpreter.set_tensor(input_details["index"], _quantize(img_batch, input_details))
+            interpreter.invoke()
+            output_details = interpreter.get_output_details()[0]
+            return _dequantize(interpreter.get_tensor(output_details["index"]), output_details)
+        finally:
+            self._pool.put(interpreter)
+
+
+BACKENDS = {
+    KerasPredictBackend.name: KerasPredictBackend,
+    TFFunctionBackend.name: TFFunctionBackend,
+    TFLiteBackend.name: TFLiteBackend,
+}
+
+
+def create_backend(name: str, model, variant: str = MODEL_VARIANT):
+    """Build the named backend around `model`, falling back to plain Keras on failure.
+
+    A quantized `variant` is always served by the TFLite backend, whatever `name` says.
+    """
+    variant = (variant or "float32").lower()
+    if variant in QUANTIZED_MODEL_PATHS:
+        try:
+            backend = TFLiteBackend(model_path=QUANTIZED_MODEL_PATHS[variant])
+            print(f"✅ Inference backend: tflite ({variant})")
+            return backend
+        except Exception as e:
+            print(f"❌ Error loading {variant} model: {e}. Run `python -m image_analysis.quantize` first")
+    elif variant != "float32":
+        print(f"⚠️ Unknown model variant '{variant}', using float32")
+
+    name = (name or "keras").lower()
+    if name not in BACKENDS:
+        print(f"⚠️ Unknown inference backend '{name}', using keras")
+        name = KerasPredictBackend.name
+    try:
+        if name == TFLiteBackend.name:
+            backend = TFLiteBackend(model=model)
+        else:
+            backend = BACKENDS[name](model)
+        print(f"✅ Inference backend: {backend.name}")
+        return backend
+    except Exception as e:
+        print(f"❌ Error creating {name} backend: {e}. Falling back to keras")
+        return KerasPredictBackend(model)
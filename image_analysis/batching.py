@@ -0,0 +1,175 @@
+import asyncio
+import os
+import time
+from collections import Counter
+import numpy as np
+from image_analysis.prediction import predict_batch
+
+# Tunables (override via environment)
+MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "16"))
+MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "10"))
+SUBMIT_TIMEOUT = float(os.getenv("INFERENCE_SUBMIT_TIMEOUT", "120"))  # seconds a request waits for its prediction
+
+
+class InferenceUnavailable(RuntimeError):
+    """A prediction could not be made in time, or no inference worker is left to make it."""
+
+
+class BatchScheduler:
+    """Collects preprocessed images from concurrent requests and runs them as one batch.
+
+    The first queued image opens a batch; it is dispatched once it holds
+    `max_batch_size` images or `max_wait_ms` has passed, whichever comes first.
+    Every caller awaits its own future and gets back its own result dict, or
+    InferenceUnavailable after `submit_timeout` seconds or when the worker
+    pool has no worker left.
+    """
+
+    def __init__(self, predict_fn=predict_batch, max_batch_size: int = MAX_BATCH_SIZE, max_wait_ms: float = MAX_WAIT_MS,
+                 submit_timeout: float = SUBMIT_TIMEOUT):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.submit_timeout = submit_timeout
+        self._queue = None
+        self._worker = None
+        self._buffer = None  # (max_batch_size, H, W, 3) float32, allocated on first batch
+        self.pool = None  # InferencePool of worker processes; inline thread if None
+
+        # Metrics
+        self.batch_size_histogram = Counter()
+        self.queue_depth_histogram = Counter()
+        self.total_requests = 0
+        self.total_batches = 0
+        self.max_queue_depth = 0
+        self.last_batch_time = 0.0
+        self.timeouts = 0
+        self.rejected = 0
+
+    def _ensure_started(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def submit(self, img_array: np.ndarray) -> dict:
+        """Queue a (1, H, W, 3) or (H, W, 3) array (uint8 or float) and wait for its prediction."""
+        self._ensure_started()
+        if img_array.ndim == 4:
+            img_array = img_array[0]
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((img_array, future))
+        self.total_requests += 1
+        depth = self._queue.qsize()
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+        try:
+            # The batch still runs if it already started; its result is simply dropped
+            return await asyncio.wait_for(future, self.submit_timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise InferenceUnavailable(f"No prediction within {self.submit_timeout:g}s")
+
+    async def _collect_batch(self) -> list:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            # Take whatever is already waiting before sleeping on the queue
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _fill_buffer(self, images: list) -> np.ndarray:
+        """Cast images into the reusable float32 batch buffer instead of allocating per batch."""
+        shape = images[0].shape
+        if self._buffer is None or self._buffer.shape[1:] != shape:
+            self._buffer = np.empty((self.max_batch_size, *shape), dtype=np.float32)
+        for i, img in enumerate(images):
+            np.copyto(self._buffer[i], img, casting='unsafe')
+        return self._buffer[:len(images)]
+
+    async def _run(self):
+        while True:
+            # With a worker pool, wait for an idle worker first; the queue keeps
+            # filling meanwhile, so batches grow with load
+            pool = self.pool
+            try:
+                worker = await pool.acquire() if pool else None
+            except Exception as e:
+                # No worker will ever come: fail what is queued instead of letting it wait
+                self._reject(await self._collect_batch(), InferenceUnavailable(str(e)))
+                continue
+            batch = await self._collect_batch()
+            if pool is not None and pool.closed:
+                # The pool shut down while this worker sat waiting for a batch
+                self._reject(batch, InferenceUnavailable(f"No inference worker available: {pool.error}"))
+                continue
+            self.queue_depth_histogram[self._queue.qsize()] += 1
+            self.batch_size_histogram[len(batch)] += 1
+            self.total_batches += 1
+
+            if worker is not None:
+                asyncio.create_task(self._dispatch(batch, worker))
+            else:
+                await self._dispatch(batch)
+
+    def _reject(self, batch: list, error: Exception):
+        for _, future in batch:
+            self.rejected += 1
+            if not future.done():
+                future.set_exception(error)
+
+    async def _dispatch(self, batch: list, worker=None):
+        futures = [future for _, future in batch]
+        try:
+            batch_start = time.time()
+            if worker is not None:
+                results = await worker.predict([img for img, _ in batch])
+            else:
+                img_batch = self._fill_buffer([img for img, _ in batch])
+                results = await asyncio.to_thread(self.predict_fn, img_batch)
+            self.last_batch_time = time.time() - batch_start
+            print(f"⏱️ Batched prediction: {len(batch)} image(s) in {self.last_batch_time:.2f}s")
+        except Exception as e:
+            print(f"❌ Batch prediction failed: {e}")
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            if worker is not None:
+                self.pool.release(worker)
+
+        for future, result in zip(futures, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "max_queue_depth": self.max_queue_depth,
+            "total_requests": self.total_requests,
+            "total_batches": self.total_batches,
+            "avg_batch_size": (self.total_requests / self.total_batches) if self.total_batches else 0.0,
+            "last_batch_time_s": self.last_batch_time,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "batch_size_histogram": dict(sorted(self.batch_size_histogram.items())),
+            "queue_depth_histogram": dict(sorted(self.queue_depth_histogram.items())),
+            "worker_pool": self.pool.stats() if self.pool else None,
+        }
+
+
+# Shared scheduler for the image-analysis routes
+scheduler = BatchScheduler()
@@ -0,0 +1,71 @@
+"""Compare p50/p99 CPU latency of the inference backends.
+
+Usage:
+    python -m image_analysis.benchmark_backends --runs 200 --batch-size 1
+    python -m image_analysis.benchmark_backends --image uploadimages/leaf.jpg
+"""
+import argparse
+import time
+import numpy as np
+from image_analysis.prediction import load_model, extract_features, IMG_SIZE
+from image_analysis.backends import KerasPredictBackend, TFFunctionBackend, TFLiteBackend
+
+
+def measure(predict_fn, img_batch: np.ndarray, runs: int, warmup: int) -> dict:
+    for _ in range(warmup):
+        predict_fn(img_batch)
+
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        predict_fn(img_batch)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    timings = np.array(timings)
+    return {
+        "p50_ms": float(np.percentile(timings, 50)),
+        "p99_ms": float(np.percentile(timings, 99)),
+        "mean_ms": float(timings.mean()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--image", help="Image to benchmark with (random input if omitted)")
+    args = parser.parse_args()
+
+    model = load_model()
+    if model is None:
+        raise SystemExit("❌ Model not loaded, nothing to benchmark")
+
+    if args.image:
+        img_array = extract_features(args.image)
+        if img_array is None:
+            raise SystemExit(f"❌ Could not read {args.image}")
+    else:
+        img_array = np.random.uniform(0, 255, size=(1, *IMG_SIZE, 3)).astype(np.float32)
+    img_batch = np.repeat(img_array, args.batch_size, axis=0)
+
+    candidates = {
+        "keras (current)": lambda: KerasPredictBackend(model),
+        "tf_function": lambda: TFFunctionBackend(model),
+        "tflite": lambda: TFLiteBackend(model=model),
+    }
+
+    print(f"Batch size {args.batch_size}, {args.runs} runs ({args.warmup} warm-up)")
+    print(f"{'backend':<18}{'p50 ms':>10}{'p99 ms':>10}{'mean ms':>10}")
+    for name, build in candidates.items():
+        try:
+            backend = build()
+        except Exception as e:
+            print(f"{name:<18}  skipped: {e}")
+            continue
+        result = measure(backend.predict, img_batch, args.runs, args.warmup)
+        print(f"{name:<18}{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}{result['mean_ms']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
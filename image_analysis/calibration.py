@@ -0,0 +1,117 @@
+"""Temperature scaling for the disease model's softmax output.
+
+The temperature is fitted offline on labelled images (one sub-folder per
+`label` class) by minimising negative log-likelihood, and saved to
+calibration.json, which prediction.py reads at import.
+
+Usage:
+    python -m image_analysis.calibration --data-dir datasets/plant_val
+"""
+import argparse
+import datetime
+import json
+import os
+import numpy as np
+
+CALIBRATION_PATH = os.getenv("CALIBRATION_PATH", "image_analysis/calibration.json")
+
+
+def load_temperature(path: str = CALIBRATION_PATH) -> float:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            temperature = float(json.load(f)["temperature"])
+        print(f"✅ Calibration loaded: temperature {temperature:.3f}")
+        return temperature
+    except FileNotFoundError:
+        return 1.0
+    except Exception as e:
+        print(f"❌ Error loading calibration: {e}")
+        return 1.0
+
+
+def apply_temperature(probabilities: np.ndarray, temperature: float) -> np.ndarray:
+    """Rescale softmax output as if its logits had been divided by `temperature`."""
+    if temperature == 1.0:
+        return probabilities
+    # log(p) equals the logits up to a per-row constant, which softmax ignores
+    logits = np.log(np.clip(probabilities, 1e-12, 1.0)) / temperature
+    logits -= logits.max(axis=-1, keepdims=True)
+    scaled = np.exp(logits)
+    return scaled / scaled.sum(axis=-1, keepdims=True)
+
+
+def negative_log_likelihood(probabilities: np.ndarray, targets: np.ndarray, temperature: float) -> float:
+    scaled = apply_temperature(probabilities, temperature)
+    return float(-np.mean(np.log(np.clip(scaled[np.arange(len(targets)), targets], 1e-12, 1.0))))
+
+
+def fit_temperature(probabilities: np.ndarray, targets: np.ndarray) -> float:
+    """Temperature minimising NLL: coarse log-spaced grid, then a finer grid around the best point."""
+    grid = np.logspace(-1, 1, 41)  # 0.1 .. 10
+    best = min(grid, key=lambda t: negative_log_likelihood(probabilities, targets, t))
+    fine = np.linspace(best / 1.2, best * 1.2, 41)
+    return float(min(fine, key=lambda t: negative_log_likelihood(probabilities, targets, t)))
+
+
+def expected_calibration_error(probabilities: np.ndarray, targets: np.ndarray, bins: int = 15) -> float:
+    confidence = probabilities.max(axis=1)
+    correct = probabilities.argmax(axis=1) == targets
+    edges = np.linspace(0, 1, bins + 1)
+    ece = 0.0
+    for low, high in zip(edges[:-1], edges[1:]):
+        in_bin = (confidence > low) & (confidence <= high)
+        if in_bin.any():
+            ece += in_bin.mean() * abs(correct[in_bin].mean() - confidence[in_bin].mean())
+    return float(ece)
+
+
+def main():
+    from image_analysis.prediction import label, load_model, extract_features, backend_predict
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", required=True, help="Folder with one sub-folder of images per label class")
+    parser.add_argument("--max-per-class", type=int, default=50)
+    parser.add_argument("--output", default=CALIBRATION_PATH)
+    args = parser.parse_args()
+
+    if load_model() is None:
+        raise SystemExit("❌ Model not loaded, nothing to calibrate")
+
+    probabilities, targets = [], []
+    for class_index, class_name in enumerate(label):
+        class_dir = os.path.join(args.data_dir, class_name)
+        if not os.path.isdir(class_dir):
+            continue
+        for name in sorted(os.listdir(class_dir))[:args.max_per_class]:
+            img_array = extract_features(os.path.join(class_dir, name))
+            if img_array is None:
+                continue
+            probabilities.append(backend_predict(img_array.astype(np.float32))[0])
+            targets.append(class_index)
+
+    if not targets:
+        raise SystemExit(f"❌ No labelled images found under {args.data_dir}")
+
+    probabilities = np.array(probabilities)[:, :len(label)]
+    targets = np.array(targets)
+    temperature = fit_temperature(probabilities, targets)
+
+    report = {
+        "temperature": temperature,
+        "samples": int(len(targets)),
+        "nll_before": negative_log_likelihood(probabilities, targets, 1.0),
+        "nll_after": negative_log_likelihood(probabilities, targets, temperature),
+        "ece_before": expected_calibration_error(probabilities, targets),
+        "ece_after": expected_calibration_error(apply_temperature(probabilities, temperature), targets),
+        "fitted_at": datetime.datetime.now().isoformat(),
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"📊 Temperature {temperature:.3f} on {report['samples']} images: "
+          f"NLL {report['nll_before']:.3f} -> {report['nll_after']:.3f}, "
+          f"ECE {report['ece_before']:.3f} -> {report['ece_after']:.3f}")
+    print(f"✅ Calibration written: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
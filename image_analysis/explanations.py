@@ -0,0 +1,173 @@
+import datetime
+import hashlib
+import json
+import os
+import re
+import threading
+from image_analysis.prediction import data
+from image_analysis.voice_helper import clean_label_for_voice, UPLOAD_VOICE_DIR
+
+# Store location and freshness (override via environment)
+EXPLANATION_STORE_DIR = os.getenv("EXPLANATION_STORE_DIR", os.path.join(UPLOAD_VOICE_DIR, "explanations"))
+EXPLANATION_MAX_AGE_DAYS = float(os.getenv("EXPLANATION_MAX_AGE_DAYS", "30"))
+
+# Language mapping for style (force transliteration in English letters)
+LANG_MAP = {
+    'hi': 'Hinglish (write Hindi in English letters, e.g. "dawa lagao, paani do")',
+    'hinglish': 'Hinglish (write Hindi in English letters, not Devanagari)',
+    'en': 'English',
+    'pa': 'Punjabi (write Punjabi in English letters, not Gurmukhi)'
+}
+
+PROMPT_TEMPLATE = (
+    "Briefly describe {disease} disease in {prompt_lang}. "
+    "Do not use native Hindi or Punjabi script, only English letters. "
+    "Explain what it is, treatment, cure, and fertilizer suggestions. "
+    "Keep it concise, under 80 words."
+    "{reference}"
+)
+# Entries built from an older prompt are treated as stale
+PROMPT_VERSION = hashlib.sha256(PROMPT_TEMPLATE.encode("utf-8")).hexdigest()[:12]
+
+
+def build_explanation_prompt(predicted_class: str, user_lang: str) -> str:
+    """Gemini prompt for a class, grounded in its cause/cure entry from `data`."""
+    info = data.get(predicted_class)
+    reference = f" Reference facts - Cause: {info['cause']} Treatment: {info['cure']}" if info else ""
+    return PROMPT_TEMPLATE.format(
+        disease=clean_label_for_voice(predicted_class),
+        prompt_lang=LANG_MAP.get(user_lang, 'English'),
+        reference=reference,
+    )
+
+
+def asset_voice_name(predicted_class: str, user_lang: str) -> str:
+    """Stable voice path (relative to UPLOAD_VOICE_DIR) for a precomputed explanation."""
+    slug = re.sub(r'[^A-Za-z0-9]+', '_', predicted_class).strip('_').lower()
+    store_subdir = os.path.relpath(EXPLANATION_STORE_DIR, UPLOAD_VOICE_DIR)
+    return os.path.join(store_subdir, user_lang, f"{slug}.mp3").replace(os.sep, "/")
+
+
+class ExplanationStore:
+    """Index of explanation texts and voice files per (predicted class, language).
+
+    The index is a JSON file next to the MP3s. Entries are fresh while
+    younger than `max_age_days` and built from the current PROMPT_VERSION.
+    The file is shared with `precompute_explanations`, so it is re-read
+    when its mtime changes and merged (newest entry per key wins) before
+    every save. Only languages in LANG_MAP are stored.
+    """
+
+    def __init__(self, directory: str = EXPLANATION_STORE_DIR, max_age_days: float = EXPLANATION_MAX_AGE_DAYS):
+        self.directory = directory
+        self.index_path = os.path.join(directory, "index.json")
+        self.max_age = datetime.timedelta(days=max_age_days)
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._mtime = None
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    @staticmethod
+    def _key(predicted_class: str, user_lang: str) -> str:
+        return f"{user_lang}:{predicted_class}"
+
+    def _read_index(self) -> dict:
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"❌ Error loading explanation store: {e}")
+            return {}
+
+    def _index_mtime(self):
+        try:
+            return os.stat(self.index_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _merge(self, entries: dict):
+        """Fold `entries` into the in-memory index, keeping the newer entry for each key."""
+        for key, entry in entries.items():
+            current = self._entries.get(key)
+            if current is None or entry.get("created_at", "") > current.get("created_at", ""):
+                self._entries[key] = entry
+
+    def load(self):
+        with self._lock:
+            self._mtime = self._index_mtime()
+            self._merge(self._read_index())
+        if self._entries:
+            print(f"✅ Explanation store loaded: {len(self._entries)} entries")
+
+    def reload_if_changed(self):
+        """Pick up entries written by another process since the last load or save."""
+        if self._index_mtime() != self._mtime:
+            with self._lock:
+                self._mtime = self._index_mtime()
+                self._merge(self._read_index())
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self.index_path}.tmp.{os.getpid()}"
+        with self._lock:
+            # Don't drop entries another process saved since we last read the file
+            self._merge(self._read_index())
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.index_path)
+            self._mtime = self._index_mtime()
+
+    def is_fresh(self, entry: dict) -> bool:
+        if entry.get("prompt_version") != PROMPT_VERSION:
+            return False
+        created_at = datetime.datetime.fromisoformat(entry["created_at"])
+        return datetime.datetime.now() - created_at < self.max_age
+
+    def get(self, predicted_class: str, user_lang: str, voice: bool) -> dict | None:
+        """Fresh entry for the class/language, or None if missing, stale or lacking a needed voice file."""
+        if user_lang not in LANG_MAP:
+            self.misses += 1
+            return None
+        self.reload_if_changed()
+        entry = self._entries.get(self._key(predicted_class, user_lang))
+        ok = (
+            entry is not None
+            and self.is_fresh(entry)
+            and (not voice or (entry.get("voice_file") and os.path.exists(os.path.join(UPLOAD_VOICE_DIR, entry["voice_file"]))))
+        )
+        if ok:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def put(self, predicted_class: str, user_lang: str, text: str, voice_file: str | None, source: str, persist: bool = True):
+        if user_lang not in LANG_MAP:
+            return
+        key = self._key(predicted_class, user_lang)
+        with self._lock:
+            previous = self._entries.get(key, {})
+            self._entries[key] = {
+                "predicted_class": predicted_class,
+                "lang": user_lang,
+                "text": text,
+                # Keep an existing voice file for the same text if this update did not synthesize one
+                "voice_file": voice_file or (previous.get("voice_file") if previous.get("text") == text else None),
+                "source": source,
+                "prompt_version": PROMPT_VERSION,
+                "created_at": datetime.datetime.now().isoformat(),
+            }
+        if persist:
+            self.save()
+
+    def stats(self) -> dict:
+        fresh = sum(1 for entry in self._entries.values() if self.is_fresh(entry))
+        return {"entries": len(self._entries), "fresh": fresh, "hits": self.hits, "misses": self.misses}
+
+
+# Shared store for the image-analysis routes
+explanation_store = ExplanationStore()
@@ -0,0 +1,83 @@
+import asyncio
+import os
+import time
+from image_analysis import prediction
+from image_analysis.batching import scheduler
+from image_analysis.worker_pool import InferencePool, INFERENCE_WORKERS
+
+# Tunables (override via environment)
+PRELOAD_MODEL = os.getenv("IMAGE_MODEL_PRELOAD", "true").lower() == "true"
+INFERENCE_IN_PROCESS = os.getenv("INFERENCE_IN_PROCESS", "false").lower() == "true"
+# INFERENCE_IN_PROCESS alone means one dedicated worker; INFERENCE_WORKERS=N asks for N
+NUM_WORKERS = INFERENCE_WORKERS or (1 if INFERENCE_IN_PROCESS else 0)
+
+# Readiness of the image-analysis subsystem, reported by /ready
+state = {
+    "status": "not_loaded",  # not_loaded | loading | ready | failed (| lazy, see readiness())
+    "mode": f"process x{NUM_WORKERS}" if NUM_WORKERS else "inline",
+    "error": None,
+    "load_time_s": None,
+}
+
+_pool = None
+
+
+async def start_image_analysis():
+    """Load and warm up the model, inline or in a pool of inference processes.
+
+    With workers, the pool is attached to the scheduler before they warm up:
+    requests queue until a worker is ready and fail if none ever is, rather
+    than loading TensorFlow inline in the API process.
+    """
+    global _pool
+    state["status"] = "loading"
+    start = time.time()
+    if NUM_WORKERS:
+        # TensorFlow and the model live only in the workers; API workers stay small
+        _pool = InferencePool(NUM_WORKERS)
+        _pool.on_exhausted = _pool_exhausted
+        scheduler.pool = _pool
+    try:
+        if NUM_WORKERS:
+            ok = await _pool.start()
+        else:
+            ok = await asyncio.to_thread(prediction.warm_up)
+    except Exception as e:
+        ok = False
+        prediction.model_error = prediction.model_error or str(e)
+        if _pool is not None:
+            _pool.close(prediction.model_error)
+
+    state["load_time_s"] = round(time.time() - start, 2)
+    if ok:
+        state["status"] = "ready"
+        print(f"⏱️ Image model ready ({state['mode']}) in {state['load_time_s']:.2f}s")
+    else:
+        state["status"] = "failed"
+        state["error"] = prediction.model_error or "Warm-up inference failed"
+
+
+def _pool_exhausted(error: str):
+    # Every worker died and none could be restarted; /ready reports it
+    state["status"] = "failed"
+    state["error"] = error
+
+
+async def stop_image_analysis():
+    global _pool
+    if _pool is not None:
+        # Stays attached: requests arriving during shutdown fail instead of running inline
+        _pool.close("Image analysis is shutting down")
+        _pool = None
+
+
+def readiness() -> dict:
+    # Without preloading, the model loads lazily on the first inline request
+    if state["status"] == "not_loaded":
+        if prediction.model is not None:
+            state["status"] = "ready"
+        elif prediction.model_error is not None:
+            state["status"], state["error"] = "failed", prediction.model_error
+        elif not PRELOAD_MODEL:
+            return {**state, "status": "lazy"}
+    return dict(state)
@@ -0,0 +1,74 @@
+"""Precompute disease explanations and voice files for every class and language.
+
+Texts come from Gemini, grounded in the cause/cure entries of `data`; voices
+come from Google Cloud TTS. Results go to the explanation store, which
+/image-analysis/analyze serves without any external call.
+
+Usage:
+    python -m image_analysis.precompute_explanations
+    python -m image_analysis.precompute_explanations --langs hi en --no-voice
+    python -m image_analysis.precompute_explanations --force --workers 8
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from chatbot.app import get_gemini_response, is_gemini_error
+from image_analysis.prediction import label
+from image_analysis.voice_helper import generate_voice
+from image_analysis.explanations import explanation_store, build_explanation_prompt, asset_voice_name, LANG_MAP
+
+
+def build_entry(predicted_class: str, user_lang: str, voice: bool) -> tuple[str, str, bool]:
+    text = get_gemini_response(build_explanation_prompt(predicted_class, user_lang))
+    if is_gemini_error(text):
+        print(f"❌ {user_lang}:{predicted_class}: {text}")
+        return predicted_class, user_lang, False
+
+    voice_file = None
+    if voice:
+        voice_file = generate_voice(text, lang=user_lang, output_name=asset_voice_name(predicted_class, user_lang))
+        if voice_file is None:
+            print(f"⚠️ {user_lang}:{predicted_class}: voice generation failed, storing text only")
+
+    explanation_store.put(predicted_class, user_lang, text, voice_file, "precomputed", persist=False)
+    return predicted_class, user_lang, True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--langs", nargs="+", choices=sorted(LANG_MAP), default=sorted(LANG_MAP))
+    parser.add_argument("--classes", nargs="+", default=label, help="Subset of `label` classes (default: all)")
+    parser.add_argument("--no-voice", action="store_true", help="Only build texts")
+    parser.add_argument("--force", action="store_true", help="Rebuild entries that are still fresh")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent Gemini/TTS calls")
+    args = parser.parse_args()
+
+    voice = not args.no_voice
+    jobs = [
+        (predicted_class, user_lang)
+        for predicted_class in args.classes
+        for user_lang in args.langs
+        if args.force or explanation_store.get(predicted_class, user_lang, voice) is None
+    ]
+    print(f"ℹ️ {len(jobs)} explanation(s) to build ({len(args.classes) * len(args.langs) - len(jobs)} already fresh)")
+
+    start = time.time()
+    built = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futures = [pool.submit(build_entry, predicted_class, user_lang, voice) for predicted_class, user_lang in jobs]
+        for future in as_completed(futures):
+            predicted_class, user_lang, ok = future.result()
+            if ok:
+                built += 1
+                print(f"✅ {user_lang}:{predicted_class}")
+                # Checkpoint regularly so an interrupted run keeps its progress
+                if built % 20 == 0:
+                    explanation_store.save()
+
+    explanation_store.save()
+    print(f"⏱️ Built {built}/{len(jobs)} explanation(s) in {time.time() - start:.1f}s")
+    print(f"📊 Store: {explanation_store.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,20 @@
 import numpy as np
 import json
-import tensorflow as tf
+import os
+import threading
+from io import BytesIO
 from PIL import Image
+from image_analysis.calibration import apply_temperature, load_temperature
 
-# Global setup (loads on import)
+# Global setup (TensorFlow and the model are loaded lazily by load_model)
 IMG_SIZE = (224, 224)
+MODEL_PATH = "image_analysis/plant_disease_recog_model_pwp (2).keras"
+
+# Prediction output and the "can't diagnose" short-circuit (override via environment)
+TOP_K = int(os.getenv("PREDICTION_TOP_K", "3"))
+CONFIDENCE_THRESHOLD = float(os.getenv("PREDICTION_CONFIDENCE_THRESHOLD", "0.5"))
+NON_DIAGNOSABLE_CLASSES = {'Background_without_leaves'}
+TEMPERATURE = load_temperature()
 
 label = [
     'Apple__Apple_scab', 'Apple_Black_rot', 'Apple_Cedar_apple_rust', 'Apple__healthy',
@@ -196,60 +206,134 @@ except Exception as e:
     print(f"❌ Error loading disease dictionary: {e}")
     disease_dict = {}  # Empty fallback
 
-# Load model
-try:
-    model = tf.keras.models.load_model("image_analysis/plant_disease_recog_model_pwp (2).keras")
-    print("✅ Model loaded successfully")
-except Exception as e:
-    print(f"❌ Error loading model: {e}")
-    model = None
+# Model state, filled in by load_model()
+model = None
+backend = None
+model_error = None
+_model_lock = threading.Lock()
+
+def load_model():
+    """Import TensorFlow and load the model plus its inference backend, once per process.
+
+    Called from the app lifespan (or a dedicated inference process); the
+    first prediction calls it too if nobody has yet. Returns the model,
+    or None if loading failed.
+    """
+    global model, backend, model_error
+    if model is not None or model_error is not None:
+        return model
+    with _model_lock:
+        if model is not None or model_error is not None:
+            return model
+        try:
+            import tensorflow as tf
+            from image_analysis.backends import create_backend, INFERENCE_BACKEND
+
+            loaded = tf.keras.models.load_model(MODEL_PATH)
+            # Inference backend (keras / tf_function / tflite, see image_analysis/backends.py)
+            backend = create_backend(INFERENCE_BACKEND, loaded)
+            model = loaded
+            print("✅ Model loaded successfully")
+        except Exception as e:
+            print(f"❌ Error loading model: {e}")
+            model_error = str(e)
+    return model
+
+def warm_up() -> bool:
+    """Load the model and run one dummy inference so the first real request skips graph setup."""
+    if load_model() is None:
+        return False
+    result = predict_batch(np.zeros((1, *IMG_SIZE, 3), dtype=np.float32))[0]
+    ok = 'predicted_class' in result
+    print("✅ Model warm-up done" if ok else f"❌ Model warm-up failed: {result.get('cause')}")
+    return ok
 
 def extract_features(image_path: str):
     try:
         img = Image.open(image_path).convert('RGB')
         img = img.resize(IMG_SIZE)
-        img_array = np.array(img)
-        img_array = tf.keras.applications.efficientnet.preprocess_input(img_array)
+        img_array = np.array(img)  # EfficientNet's preprocess_input is a pass-through
         img_array = np.expand_dims(img_array, axis=0)
         return img_array
     except Exception as e:
         print(f"❌ Error extracting features: {e}")
         return None
 
+def decode_image_bytes(image_bytes: bytes):
+    """Decode an upload straight from memory into a (224, 224, 3) uint8 array.
+
+    For JPEGs, `draft` lets libjpeg decode at the smallest 1/2, 1/4 or 1/8
+    scale that is still at least IMG_SIZE, so large phone photos are never
+    fully decoded. Casting to float32 happens later, when the batching
+    scheduler copies the array into its preallocated batch buffer
+    (EfficientNet's preprocess_input is a pass-through).
+    """
+    try:
+        img = Image.open(BytesIO(image_bytes))
+        img.draft('RGB', IMG_SIZE)
+        img = img.convert('RGB').resize(IMG_SIZE)
+        return np.asarray(img)
+    except Exception as e:
+        print(f"❌ Error decoding image: {e}")
+        return None
+
+def _format_prediction(probabilities: np.ndarray, raw_probabilities: np.ndarray) -> dict:
+    """Turn one row of calibrated softmax output into the response dict used by the routes."""
+    num_classes = len(label)
+    if np.argmax(probabilities) >= num_classes:
+        print(f"⚠️ Warning: Predicted index {np.argmax(probabilities)} exceeds label count {num_classes}. Using the best valid label.")
+    valid = probabilities[:num_classes]
+    top_indices = np.argsort(valid)[::-1][:TOP_K]
+    idx = int(top_indices[0])
+
+    predicted_class_name = label[idx]
+    prediction_info = disease_dict.get(predicted_class_name, {})
+    return {
+        "predicted_class": predicted_class_name,
+        "confidence": float(valid[idx]),
+        "raw_confidence": float(raw_probabilities[idx]),
+        "top_k": [{"class": label[i], "confidence": float(valid[i])} for i in top_indices],
+        "cause": prediction_info.get('cause', 'Information not available'),
+        "cure": prediction_info.get('cure', 'Information not available')
+    }
+
+def is_diagnosable(analysis_result: dict) -> bool:
+    """False for leafless images and low-confidence predictions, which skip the Gemini and TTS stages."""
+    return (
+        analysis_result.get("predicted_class") not in NON_DIAGNOSABLE_CLASSES
+        and analysis_result.get("confidence", 0.0) >= CONFIDENCE_THRESHOLD
+    )
+
+def backend_predict(img_batch: np.ndarray) -> np.ndarray:
+    """Raw (uncalibrated) softmax output of the configured backend."""
+    load_model()
+    return backend.predict(img_batch)
+
+def predict_batch(img_batch: np.ndarray) -> list[dict]:
+    """Run one forward pass over a preprocessed (N, 224, 224, 3) batch.
+
+    Returns one result dict per row, in input order. Used by the batching
+    scheduler so concurrent requests share a single model call.
+    """
+    if load_model() is None:
+        return [{"cause": "Model not loaded properly.", "cure": "Please check the model file."}] * len(img_batch)
+
+    try:
+        raw = backend_predict(img_batch)
+        calibrated = apply_temperature(raw, TEMPERATURE)
+        return [_format_prediction(row, raw_row) for row, raw_row in zip(calibrated, raw)]
+    except Exception as e:
+        print(f"❌ Error during prediction: {e}")
+        import traceback
+        print(traceback.format_exc())  # Full stack trace for debugging
+        return [{"cause": f"Error during prediction: {e}", "cure": "Please try again."}] * len(img_batch)
+
 def model_predict(image_path: str):
-    if model is None:
+    if load_model() is None:
         return {"cause": "Model not loaded properly.", "cure": "Please check the model file."}
     
     img_array = extract_features(image_path)
     if img_array is None:
         return {"cause": "Could not process the image.", "cure": "Please try with a different image."}
     
-    try:
-        prediction = model.predict(img_array)
-        print(f"🔍 Prediction shape: {prediction.shape}")  # Debug: Should be (1, 40)
-        print(f"🔍 Raw probabilities: {prediction[0]}")  # Debug: See all 40 values
-        
-        idx = np.argmax(prediction[0])
-        print(f"🔍 Argmax index: {idx}")  # Debug: What index is chosen?
-        
-        num_classes = len(label)
-        if idx >= num_classes:
-            print(f"⚠️ Warning: Predicted index {idx} exceeds label count {num_classes}. Clamping to {num_classes-1}.")
-            idx = num_classes - 1  # Clamp to last valid label (or raise error)
-        
-        predicted_class_name = label[idx]
-        confidence = prediction[0][idx]
-        print(f"🔍 Predicted: {predicted_class_name}, Confidence: {confidence:.4f}")
-        
-        prediction_info = disease_dict.get(predicted_class_name, {})
-        return {
-            "predicted_class": predicted_class_name,
-            "confidence": float(confidence),
-            "cause": prediction_info.get('cause', 'Information not available'),
-            "cure": prediction_info.get('cure', 'Information not available')
-        }
-    except Exception as e:
-        print(f"❌ Error during prediction: {e}")
-        import traceback
-        print(traceback.format_exc())  # Full stack trace for debugging
-        return {"cause": f"Error during prediction: {e}", "cure": "Please try again."}
\ No newline at end of file
+    return predict_batch(img_array)[0]
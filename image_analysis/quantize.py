@@ -0,0 +1,132 @@
+"""Build float16 and int8 TFLite variants of the disease model and check their accuracy.
+
+Calibration and evaluation images are drawn from stored uploads (uploadimages/).
+Each variant is scored by top-1 agreement with the float32 Keras model, overall
+and per class, and the report is written next to the model.
+
+Usage:
+    python -m image_analysis.quantize
+    python -m image_analysis.quantize --variants int8 --min-agreement 0.98
+"""
+import argparse
+import json
+import os
+import random
+from collections import Counter
+import numpy as np
+import tensorflow as tf
+from image_analysis.prediction import load_model, extract_features, label
+from image_analysis.backends import QUANTIZED_MODEL_PATHS, TFLiteBackend, convert_to_tflite
+
+UPLOAD_DIR = "uploadimages"
+REPORT_PATH = "image_analysis/quantization_report.json"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def load_upload_images(upload_dir: str, limit: int, seed: int) -> list[np.ndarray]:
+    """Preprocess up to `limit` stored uploads into (1, 224, 224, 3) arrays."""
+    paths = sorted(
+        os.path.join(upload_dir, name)
+        for name in os.listdir(upload_dir)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    random.Random(seed).shuffle(paths)
+
+    images = []
+    for path in paths:
+        img_array = extract_features(path)
+        if img_array is not None:
+            images.append(img_array.astype(np.float32))
+        if len(images) >= limit:
+            break
+    return images
+
+
+def build_variant(model, variant: str, calibration_images: list[np.ndarray]) -> str:
+    output_path = QUANTIZED_MODEL_PATHS[variant]
+    if variant == "float16":
+        return convert_to_tflite(
+            model, output_path,
+            optimizations=[tf.lite.Optimize.DEFAULT],
+            supported_types=[tf.float16],
+        )
+
+    def representative_dataset():
+        for img_array in calibration_images:
+            yield [img_array]
+
+    # Float input/output are kept so the variant is a drop-in for the float32 model
+    return convert_to_tflite(
+        model, output_path,
+        optimizations=[tf.lite.Optimize.DEFAULT],
+        representative_dataset=representative_dataset,
+    )
+
+
+def agreement_report(reference_top1: np.ndarray, variant_top1: np.ndarray) -> dict:
+    per_class_total = Counter(int(i) for i in reference_top1)
+    per_class_agree = Counter(int(r) for r, v in zip(reference_top1, variant_top1) if r == v)
+    return {
+        "samples": int(len(reference_top1)),
+        "top1_agreement": float(np.mean(reference_top1 == variant_top1)) if len(reference_top1) else 0.0,
+        "per_class": {
+            label[idx]: {
+                "samples": per_class_total[idx],
+                "agreement": per_class_agree[idx] / per_class_total[idx],
+            }
+            for idx in sorted(per_class_total)
+            if idx < len(label)
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--variants", nargs="+", choices=sorted(QUANTIZED_MODEL_PATHS), default=sorted(QUANTIZED_MODEL_PATHS))
+    parser.add_argument("--upload-dir", default=UPLOAD_DIR)
+    parser.add_argument("--calibration-size", type=int, default=200)
+    parser.add_argument("--eval-size", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-agreement", type=float, default=None, help="Exit non-zero if any variant falls below this top-1 agreement")
+    args = parser.parse_args()
+
+    model = load_model()
+    if model is None:
+        raise SystemExit("❌ Model not loaded, nothing to quantize")
+
+    images = load_upload_images(args.upload_dir, args.calibration_size + args.eval_size, args.seed)
+    if len(images) < 2:
+        raise SystemExit(f"❌ Need at least 2 images in {args.upload_dir}, found {len(images)}")
+
+    # Keep calibration and evaluation images disjoint
+    split = min(args.calibration_size, len(images) // 2)
+    calibration_images, eval_images = images[:split], images[split:]
+    print(f"ℹ️ {len(calibration_images)} calibration / {len(eval_images)} evaluation images")
+
+    eval_batch = np.concatenate(eval_images, axis=0)
+    reference_top1 = np.argmax(model.predict(eval_batch, verbose=0), axis=1)
+
+    report = {}
+    for variant in args.variants:
+        path = build_variant(model, variant, calibration_images)
+        backend = TFLiteBackend(model_path=path, pool_size=1)
+        variant_top1 = np.argmax(np.concatenate([backend.predict(img) for img in eval_images], axis=0), axis=1)
+
+        report[variant] = agreement_report(reference_top1, variant_top1)
+        report[variant]["model_path"] = path
+        report[variant]["size_mb"] = os.path.getsize(path) / 1e6
+        print(f"📊 {variant}: top-1 agreement {report[variant]['top1_agreement']:.2%} "
+              f"over {report[variant]['samples']} images, {report[variant]['size_mb']:.1f} MB")
+
+    with open(REPORT_PATH, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Report written: {REPORT_PATH}")
+
+    if args.min_agreement is not None:
+        failing = [v for v, r in report.items() if r["top1_agreement"] < args.min_agreement]
+        if failing:
+            raise SystemExit(f"❌ Below {args.min_agreement:.2%} agreement: {', '.join(failing)}")
+
+
+if __name__ == "__main__":
+    main()
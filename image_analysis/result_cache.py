@@ -0,0 +1,126 @@
+import datetime
+import hashlib
+import os
+import time
+from collections import OrderedDict
+
+# Tunables (override via environment)
+RESULT_CACHE_SIZE = int(os.getenv("IMAGE_RESULT_CACHE_SIZE", "512"))
+RESULT_CACHE_TTL = int(os.getenv("IMAGE_RESULT_CACHE_TTL", "86400"))  # seconds
+RESULT_CACHE_MONGO = os.getenv("IMAGE_RESULT_CACHE_MONGO", "false").lower() == "true"
+
+
+def make_cache_key(image_bytes: bytes, lang: str, voice: bool) -> str:
+    """Content address of an analysis: hash of the uploaded bytes plus the options that change the answer."""
+    digest = hashlib.sha256(image_bytes).hexdigest()
+    return f"{digest}:{lang.lower()}:{int(bool(voice))}"
+
+
+class AnalysisResultCache:
+    """Two-tier cache of /analyze responses keyed by `make_cache_key`.
+
+    An in-memory LRU answers repeats within a worker; the optional Mongo
+    tier (a collection with a TTL index on `expires_at`) shares results
+    across workers and restarts. Entries expire after `ttl_seconds` in both tiers.
+    """
+
+    def __init__(self, max_entries: int = RESULT_CACHE_SIZE, ttl_seconds: int = RESULT_CACHE_TTL, collection=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.collection = collection
+        self._entries = OrderedDict()  # key -> (expires_at monotonic, value)
+        self._indexes_ready = False
+
+        # Metrics
+        self.hits = 0
+        self.mongo_hits = 0
+        self.misses = 0
+
+    async def _ensure_indexes(self):
+        if self._indexes_ready or self.collection is None:
+            return
+        try:
+            await self.collection.create_index("expires_at", expireAfterSeconds=0)
+            self._indexes_ready = True
+        except Exception as e:
+            print(f"❌ Cache index error: {e}")
+
+    def _remember(self, key: str, value: dict, ttl: float):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+
+        if self.collection is not None:
+            try:
+                doc = await self.collection.find_one({"_id": key, "expires_at": {"$gt": datetime.datetime.utcnow()}})
+                if doc:
+                    remaining = (doc["expires_at"] - datetime.datetime.utcnow()).total_seconds()
+                    self._remember(key, doc["value"], remaining)
+                    self.hits += 1
+                    self.mongo_hits += 1
+                    return doc["value"]
+            except Exception as e:
+                print(f"❌ Cache read error: {e}")
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: dict):
+        self._remember(key, value, self.ttl_seconds)
+        if self.collection is not None:
+            await self._ensure_indexes()
+            try:
+                await self.collection.update_one(
+                    {"_id": key},
+                    {"$set": {
+                        "value": value,
+                        "expires_at": datetime.datetime.utcnow() + datetime.timedelta(seconds=self.ttl_seconds),
+                    }},
+                    upsert=True,
+                )
+            except Exception as e:
+                print(f"❌ Cache write error: {e}")
+
+    async def invalidate(self, key: str):
+        self._entries.pop(key, None)
+        if self.collection is not None:
+            try:
+                await self.collection.delete_one({"_id": key})
+            except Exception as e:
+                print(f"❌ Cache delete error: {e}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "persistent_tier": self.collection is not None,
+            "hits": self.hits,
+            "mongo_hits": self.mongo_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+        }
+
+
+def _build_cache() -> AnalysisResultCache:
+    collection = None
+    if RESULT_CACHE_MONGO:
+        from auth.database import db
+        collection = db["image_analysis_cache"]
+    return AnalysisResultCache(collection=collection)
+
+
+# Shared cache for the image-analysis routes
+result_cache = _build_cache()
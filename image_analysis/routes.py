@@ -1,24 +1,44 @@
 from fastapi import APIRouter, HTTPException, Request, UploadFile, File, Query
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from auth.database import db
 import traceback
 import datetime
-import shutil
 import uuid
 import time
 import asyncio
-from image_analysis.prediction import model_predict
-from image_analysis.voice_helper import generate_voice, clean_label_for_voice
-from chatbot.app import get_gemini_response
+import io
+import json
+import zipfile
+from image_analysis.prediction import decode_image_bytes, is_diagnosable, data, NON_DIAGNOSABLE_CLASSES
+from image_analysis.batching import scheduler, InferenceUnavailable
+from image_analysis.result_cache import result_cache, make_cache_key
+from image_analysis.voice_helper import generate_voice_async, clean_label_for_voice, UPLOAD_VOICE_DIR
+from image_analysis.explanations import explanation_store, build_explanation_prompt
+from chatbot.app import is_gemini_error
+from chatbot.gemini_client import get_gemini_response_async
 import os
 
 UPLOAD_DIR = "uploadimages"
+SAVE_UPLOADED_IMAGES = os.getenv("SAVE_UPLOADED_IMAGES", "true").lower() == "true"
+BATCH_MAX_IMAGES = int(os.getenv("IMAGE_BATCH_MAX_IMAGES", "100"))
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_MB", "10")) * 1024 * 1024  # per image, after decompression
+BATCH_MAX_BYTES = int(os.getenv("IMAGE_BATCH_MAX_MB", "200")) * 1024 * 1024  # whole batch, after decompression
+ALLOWED_IMAGE_TYPES = ["image/jpeg", "image/png", "image/jpg"]
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
 
+def save_upload(image_path: str, image_bytes: bytes):
+    """Persist the original upload (runs in a background thread)."""
+    try:
+        with open(image_path, "wb") as buffer:
+            buffer.write(image_bytes)
+    except Exception as e:
+        print(f"❌ Image save error: {e}")
+
 async def save_analysis_to_db(analysis_data: dict):
     """Async helper to save analysis to MongoDB."""
     try:
@@ -27,6 +47,58 @@ async def save_analysis_to_db(analysis_data: dict):
     except Exception as e:
         print(f"❌ DB save error: {e}")
 
+def undiagnosable_message(analysis_result: dict) -> str:
+    """Guidance shown instead of a disease explanation when the image can't be diagnosed."""
+    if analysis_result['predicted_class'] in NON_DIAGNOSABLE_CLASSES:
+        return data[analysis_result['predicted_class']]['cure']
+    return (
+        f"We could not identify the disease with enough confidence ({analysis_result['confidence']:.0%}). "
+        f"Please upload a clear, close-up photo of the affected leaf in good light."
+    )
+
+def build_summary(analysis_result: dict) -> str:
+    """Summary text (English for reference)."""
+    if not is_diagnosable(analysis_result):
+        return undiagnosable_message(analysis_result)
+    cleaned_result = clean_label_for_voice(analysis_result['predicted_class'])
+    return (
+        f"This leaf is affected by {cleaned_result}. "
+        f"Cause: {analysis_result['cause']}. "
+        f"Treatment: {analysis_result['cure']}."
+    )
+
+async def explain_disease(predicted_class: str, user_lang: str, voice: bool) -> tuple[str, str | None]:
+    """Explanation of a predicted class, plus its voice file if requested.
+
+    Served from the precomputed explanation store when it has a fresh entry;
+    otherwise generated live with Gemini/TTS and written back to the store.
+    Languages outside LANG_MAP get the English prompt and are never stored.
+    """
+    entry = explanation_store.get(predicted_class, user_lang, voice)
+    if entry:
+        print(f"✅ Explanation served from store ({entry['source']})")
+        return entry["text"], entry["voice_file"] if voice else None
+
+    detailed_prompt = build_explanation_prompt(predicted_class, user_lang)
+    gemini_start = time.time()
+    detailed_info = await get_gemini_response_async(detailed_prompt)
+    gemini_end = time.time()
+    print(f"⏱️ Gemini API time: {gemini_end - gemini_start:.2f}s")
+
+    # Generate voice (optional)
+    voice_filename = None
+    if voice:
+        voice_start = time.time()
+        voice_filename = await generate_voice_async(detailed_info, lang=user_lang)  # Now safe with transliteration
+        voice_end = time.time()
+        print(f"⏱️ Voice generation time: {voice_end - voice_start:.2f}s")
+    else:
+        print("⏱️ Voice generation skipped (voice=false)")
+
+    if not is_gemini_error(detailed_info):
+        await asyncio.to_thread(explanation_store.put, predicted_class, user_lang, detailed_info, voice_filename, "live")
+    return detailed_info, voice_filename
+
 @router.post("/analyze")
 async def analyze_image_endpoint(
     request: Request, 
@@ -36,21 +108,47 @@ async def analyze_image_endpoint(
 ):
     start_time = time.time()
     try:
-        if file.content_type not in ["image/jpeg", "image/png", "image/jpg"]:
+        if file.content_type not in ALLOWED_IMAGE_TYPES:
             raise HTTPException(status_code=400, detail="Only JPEG or PNG images are supported")
 
+        image_bytes = await file.read()
+        user_lang = lang.lower()
+
+        # Retries of the same photo are answered from the content-hash cache
+        cache_key = make_cache_key(image_bytes, user_lang, voice)
+        cached = await result_cache.get(cache_key)
+        if cached and (not cached["voice_file"] or os.path.exists(os.path.join(UPLOAD_VOICE_DIR, cached["voice_file"]))):
+            print(f"⏱️ Cache hit, total endpoint time: {time.time() - start_time:.2f}s")
+            return {
+                "filename": cached["filename"],
+                "image_url": cached.get("image_url"),
+                "analysis_result": cached["analysis_result"],
+                "summary_text": cached["summary_text"],
+                "detailed_info": cached["detailed_info"],
+                "voice_url": f"/uploadvoices/{cached['voice_file']}" if cached["voice_file"] else None,
+                "diagnosable": is_diagnosable(cached["analysis_result"]),
+                "cached": True,
+                "timestamp": str(datetime.datetime.now())
+            }
+
         filename = f"temp_{uuid.uuid4().hex}_{file.filename}"
         image_path = os.path.join(UPLOAD_DIR, filename)
 
-        with open(image_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        image_url = f"/uploadimages/{filename}" if SAVE_UPLOADED_IMAGES else None
+
+        # Keeping the original is off the latency-critical path
+        if SAVE_UPLOADED_IMAGES:
+            asyncio.create_task(asyncio.to_thread(save_upload, image_path, image_bytes))
         
         upload_end = time.time()
         print(f"⏱️ Upload time: {upload_end - start_time:.2f}s")
 
-        # Run prediction in background thread
+        # Decode from memory in a worker thread, then queue for a batched forward pass
         analysis_start = time.time()
-        analysis_result = await asyncio.to_thread(model_predict, image_path)
+        img_array = await asyncio.to_thread(decode_image_bytes, image_bytes)
+        if img_array is None:
+            raise HTTPException(status_code=400, detail="Image analysis failed: Could not process the image.")
+        analysis_result = await scheduler.submit(img_array)
         analysis_end = time.time()
         print(f"⏱️ Model prediction time: {analysis_end - analysis_start:.2f}s")
 
@@ -58,52 +156,20 @@ async def analyze_image_endpoint(
         if 'predicted_class' not in analysis_result:
             raise HTTPException(status_code=400, detail=f"Image analysis failed: {analysis_result.get('cause', 'Unknown error')}")
 
-        # Clean disease name for natural language
-        cleaned_result = clean_label_for_voice(analysis_result['predicted_class'])
+        summary = build_summary(analysis_result)
 
-        # Language mapping for style (force transliteration in English letters)
-        lang_map = {
-            'hi': 'Hinglish (write Hindi in English letters, e.g. "dawa lagao, paani do")',
-            'hinglish': 'Hinglish (write Hindi in English letters, not Devanagari)',
-            'en': 'English',
-            'pa': 'Punjabi (write Punjabi in English letters, not Gurmukhi)'
-        }
-        user_lang = lang.lower()
-        prompt_lang = lang_map.get(user_lang, 'English')
-
-        # Build summary text (English for reference)
-        summary = (
-            f"This leaf is affected by {cleaned_result}. "
-            f"Cause: {analysis_result['cause']}. "
-            f"Treatment: {analysis_result['cure']}."
-        )
-
-        # Craft prompt for Gemini (force transliteration)
-        detailed_prompt = (
-            f"Briefly describe {cleaned_result} disease in {prompt_lang}. "
-            f"Do not use native Hindi or Punjabi script, only English letters. "
-            f"Explain what it is, treatment, cure, and fertilizer suggestions. "
-            f"Keep it concise, under 80 words."
-        )
-        gemini_start = time.time()
-        detailed_info = get_gemini_response(detailed_prompt)
-        gemini_end = time.time()
-        print(f"⏱️ Gemini API time: {gemini_end - gemini_start:.2f}s")
-
-        # Generate voice (optional)
-        voice_filename = None
-        if voice:
-            voice_start = time.time()
-            voice_filename = generate_voice(detailed_info, lang=user_lang)  # Now safe with transliteration
-            voice_end = time.time()
-            print(f"⏱️ Voice generation time: {voice_end - voice_start:.2f}s")
+        # Leafless or low-confidence images skip Gemini and TTS entirely
+        diagnosable = is_diagnosable(analysis_result)
+        if diagnosable:
+            detailed_info, voice_filename = await explain_disease(analysis_result['predicted_class'], user_lang, voice)
         else:
-            print("⏱️ Voice generation skipped (voice=false)")
+            print(f"⏱️ Not diagnosable ({analysis_result['predicted_class']}, {analysis_result['confidence']:.2f}), Gemini and voice skipped")
+            detailed_info, voice_filename = undiagnosable_message(analysis_result), None
 
         # Prepare DB data
         analysis_data = {
             "filename": filename,
-            "full_path": image_path,
+            "full_path": image_path if SAVE_UPLOADED_IMAGES else None,
             "analysis_result": analysis_result,
             "summary_text": summary,
             "detailed_info": detailed_info,
@@ -115,22 +181,205 @@ async def analyze_image_endpoint(
         # Save to DB in background
         asyncio.create_task(save_analysis_to_db(analysis_data))
 
+        # Don't pin a Gemini fallback, or an answer missing its requested voice, for the cache TTL
+        voice_complete = not (voice and diagnosable) or voice_filename is not None
+        if not is_gemini_error(detailed_info) and voice_complete:
+            await result_cache.set(cache_key, {
+                "filename": filename,
+                "image_url": image_url,
+                "analysis_result": analysis_result,
+                "summary_text": summary,
+                "detailed_info": detailed_info,
+                "voice_file": voice_filename,
+            })
+
         total_time = time.time() - start_time
         print(f"⏱️ Total endpoint time: {total_time:.2f}s")
 
         return {
             "filename": filename,
-            "image_url": f"/uploadimages/{filename}",
+            "image_url": image_url,
             "analysis_result": analysis_result,
             "summary_text": summary,
             "detailed_info": detailed_info,
             "voice_url": f"/uploadvoices/{voice_filename}" if voice_filename else None,
+            "diagnosable": diagnosable,
+            "cached": False,
             "timestamp": str(datetime.datetime.now())
         }
+    except InferenceUnavailable as e:
+        print(f"❌ /analyze: {e}")
+        raise HTTPException(status_code=503, detail=f"Image analysis is unavailable: {str(e)}")
     except Exception as e:
         print(f"Error in /analyze: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+def read_batch_images(files: list[UploadFile] | None, archive_bytes: bytes | None, file_bytes: list[bytes]) -> list[tuple[str, bytes]]:
+    """Collect (name, bytes) pairs from the uploaded images and/or zip archive.
+
+    Archive members are checked against the image count and the per-image and
+    batch size limits (by their declared uncompressed size) before any is
+    extracted, so a zip bomb is rejected without being inflated.
+    """
+    images = []
+    total_bytes = 0
+    for upload, content in zip(files or [], file_bytes):
+        if upload.content_type not in ALLOWED_IMAGE_TYPES:
+            raise HTTPException(status_code=400, detail=f"{upload.filename}: only JPEG or PNG images are supported")
+        images.append((upload.filename, content))
+        total_bytes += len(content)
+
+    if archive_bytes:
+        try:
+            with zipfile.ZipFile(io.BytesIO(archive_bytes)) as zf:
+                members = [
+                    info for info in zf.infolist()
+                    if not info.is_dir() and not info.filename.startswith("__MACOSX/")
+                    and info.filename.lower().endswith(IMAGE_EXTENSIONS)
+                ]
+                if len(images) + len(members) > BATCH_MAX_IMAGES:
+                    raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_IMAGES} images per batch")
+                for info in members:
+                    if info.file_size > IMAGE_MAX_BYTES:
+                        raise HTTPException(status_code=413, detail=f"{info.filename}: images are limited to {IMAGE_MAX_BYTES // (1024 * 1024)} MB")
+                    total_bytes += info.file_size
+                    if total_bytes > BATCH_MAX_BYTES:
+                        raise HTTPException(status_code=413, detail=f"Batch exceeds {BATCH_MAX_BYTES // (1024 * 1024)} MB uncompressed")
+                for info in members:
+                    # Never read past the declared size, whatever the member's headers claim
+                    with zf.open(info) as member:
+                        content = member.read(IMAGE_MAX_BYTES + 1)
+                    if len(content) > IMAGE_MAX_BYTES:
+                        raise HTTPException(status_code=413, detail=f"{info.filename}: images are limited to {IMAGE_MAX_BYTES // (1024 * 1024)} MB")
+                    images.append((os.path.basename(info.filename), content))
+        except zipfile.BadZipFile:
+            raise HTTPException(status_code=400, detail="Archive is not a valid zip file")
+
+    if not images:
+        raise HTTPException(status_code=400, detail="No JPEG or PNG images found in the upload")
+    if len(images) > BATCH_MAX_IMAGES:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_IMAGES} images per batch")
+    return images
+
+async def read_upload_capped(upload: UploadFile, limit: int) -> bytes:
+    """Read an upload, rejecting it as soon as it exceeds `limit` bytes."""
+    content = await upload.read(limit + 1)
+    if len(content) > limit:
+        raise HTTPException(status_code=413, detail=f"{upload.filename}: upload exceeds {limit // (1024 * 1024)} MB")
+    return content
+
+@router.post("/analyze-batch")
+async def analyze_batch_endpoint(
+    files: list[UploadFile] | None = File(None, description="Leaf images (JPEG/PNG)"),
+    archive: UploadFile | None = File(None, description="Zip archive of leaf images"),
+    voice: bool = Query(True, description="Generate voice?"),
+    lang: str = Query("hi", description="Language: 'hi' for Hinglish, 'en' for English, 'pa' for Punjabi")
+):
+    """Analyze a field survey in one request, streaming one NDJSON line per image as it completes.
+
+    Images go through the batching scheduler together, and each distinct
+    predicted class gets a single Gemini explanation and voice file that
+    all of its images share.
+    """
+    start_time = time.time()
+    user_lang = lang.lower()
+    batch_id = uuid.uuid4().hex
+
+    # Read everything up front (the uploads are closed once streaming starts),
+    # checking the count and sizes before buffering anything
+    if len(files or []) > BATCH_MAX_IMAGES:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_IMAGES} images per batch")
+    file_bytes = []
+    for upload in files or []:
+        file_bytes.append(await read_upload_capped(upload, IMAGE_MAX_BYTES))
+        if sum(len(content) for content in file_bytes) > BATCH_MAX_BYTES:
+            raise HTTPException(status_code=413, detail=f"Batch exceeds {BATCH_MAX_BYTES // (1024 * 1024)} MB")
+    archive_bytes = await read_upload_capped(archive, BATCH_MAX_BYTES) if archive else None
+    # Inflating an archive is CPU- and memory-heavy; keep it off the event loop
+    images = await asyncio.to_thread(read_batch_images, files, archive_bytes, file_bytes)
+    print(f"📦 Batch {batch_id}: {len(images)} image(s)")
+
+    explanations = {}  # predicted_class -> Task[(detailed_info, voice_filename)]
+
+    async def analyze_one(index: int, name: str, image_bytes: bytes) -> dict:
+        filename = f"temp_{uuid.uuid4().hex}_{name}"
+        image_url = f"/uploadimages/{filename}" if SAVE_UPLOADED_IMAGES else None
+        if SAVE_UPLOADED_IMAGES:
+            asyncio.create_task(asyncio.to_thread(save_upload, os.path.join(UPLOAD_DIR, filename), image_bytes))
+
+        img_array = await asyncio.to_thread(decode_image_bytes, image_bytes)
+        if img_array is None:
+            return {"index": index, "filename": name, "error": "Could not process the image."}
+        analysis_result = await scheduler.submit(img_array)
+        if 'predicted_class' not in analysis_result:
+            return {"index": index, "filename": name, "error": analysis_result.get('cause', 'Unknown error')}
+
+        diagnosable = is_diagnosable(analysis_result)
+        if diagnosable:
+            # One explanation per disease, shared by every image of that class
+            predicted_class = analysis_result['predicted_class']
+            if predicted_class not in explanations:
+                explanations[predicted_class] = asyncio.create_task(explain_disease(predicted_class, user_lang, voice))
+            detailed_info, voice_filename = await explanations[predicted_class]
+        else:
+            detailed_info, voice_filename = undiagnosable_message(analysis_result), None
+
+        summary = build_summary(analysis_result)
+        asyncio.create_task(save_analysis_to_db({
+            "filename": filename,
+            "full_path": os.path.join(UPLOAD_DIR, filename) if SAVE_UPLOADED_IMAGES else None,
+            "analysis_result": analysis_result,
+            "summary_text": summary,
+            "detailed_info": detailed_info,
+            "voice_file": voice_filename,
+            "user_lang": user_lang,
+            "batch_id": batch_id,
+            "timestamp": datetime.datetime.now()
+        }))
+        return {
+            "index": index,
+            "filename": filename,
+            "image_url": image_url,
+            "analysis_result": analysis_result,
+            "summary_text": summary,
+            "detailed_info": detailed_info,
+            "voice_url": f"/uploadvoices/{voice_filename}" if voice_filename else None,
+            "diagnosable": diagnosable,
+        }
+
+    async def safe_analyze(index: int, name: str, image_bytes: bytes) -> dict:
+        try:
+            return await analyze_one(index, name, image_bytes)
+        except Exception as e:
+            print(f"Error in /analyze-batch: {traceback.format_exc()}")
+            return {"index": index, "filename": name, "error": str(e)}
+
+    async def stream_results():
+        tasks = [asyncio.create_task(safe_analyze(i, name, image_bytes)) for i, (name, image_bytes) in enumerate(images)]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield json.dumps(await finished, default=str) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        total_time = time.time() - start_time
+        print(f"⏱️ Batch {batch_id}: {len(images)} image(s), {len(explanations)} class(es) in {total_time:.2f}s")
+        yield json.dumps({
+            "done": True,
+            "batch_id": batch_id,
+            "count": len(images),
+            "classes": sorted(explanations),
+            "total_time_s": round(total_time, 2),
+        }) + "\n"
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+@router.get("/inference-stats")
+async def inference_stats():
+    """Queue depth and batch-size histograms of the batching scheduler, plus result-cache hit rate."""
+    return {**scheduler.stats(), "result_cache": result_cache.stats(), "explanation_store": explanation_store.stats()}
+
 @router.get("/dashboard", response_class=HTMLResponse)
 async def image_analysis_dashboard(request: Request):
     try:
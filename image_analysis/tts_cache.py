@@ -0,0 +1,236 @@
+import asyncio
+import datetime
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: index updates are merged but not locked
+    fcntl = None
+
+# Tunables (override via environment)
+TTS_CACHE_ENABLED = os.getenv("TTS_CACHE_ENABLED", "true").lower() == "true"
+TTS_CACHE_SUBDIR = os.getenv("TTS_CACHE_SUBDIR", "tts_cache")  # under uploadvoices/
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_MB", "512")) * 1024 * 1024
+TTS_CACHE_SWEEP_INTERVAL = int(os.getenv("TTS_CACHE_SWEEP_INTERVAL", "3600"))  # seconds
+
+# Unindexed files younger than this may belong to another process that has not saved its index yet;
+# every process saves at least once per sweep, so two intervals is a safe margin
+ORPHAN_GRACE_SECONDS = max(600, 2 * TTS_CACHE_SWEEP_INTERVAL)
+# Index writes are batched; the sweeper and shutdown flush the rest
+SAVE_EVERY = 20
+
+
+def make_tts_key(request: dict) -> str:
+    """Content address of a synthesis: hash of the serialized input, voice and audio config."""
+    digest = hashlib.sha256()
+    for field in ("input", "voice", "audio_config"):
+        message = request[field]
+        digest.update(type(message).serialize(message))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class TTSCache:
+    """Synthesized MP3s (and their playlists) stored once per content hash under `directory`.
+
+    index.json records size and last use per hash; entries are evicted
+    least-recently-used once the total exceeds `max_bytes`. `sweep()`
+    reconciles the index with the directory: it drops entries whose file
+    is gone, deletes files no entry points to, and re-applies the size bound.
+    Several worker processes may share the directory, so `save()` and
+    `sweep()` first merge the on-disk index (latest use wins) under an
+    exclusive lock on index.lock.
+    """
+
+    def __init__(self, root: str, subdir: str = TTS_CACHE_SUBDIR, max_bytes: int = TTS_CACHE_MAX_BYTES):
+        self.root = root
+        self.subdir = subdir
+        self.directory = os.path.join(root, subdir)
+        self.index_path = os.path.join(self.directory, "index.json")
+        self.lock_path = os.path.join(self.directory, "index.lock")
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # file name -> {"size", "created_at", "last_used"}, oldest use first
+        self._total_bytes = 0
+        self._unsaved = 0
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.orphans_removed = 0
+        self.last_swept = None
+        self.load()
+
+    def relative_name(self, name: str) -> str:
+        """Path relative to `root` (uploadvoices/), as returned by generate_voice."""
+        return f"{self.subdir}/{name}"
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def load(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+            self._entries = OrderedDict(sorted(entries.items(), key=lambda item: item[1]["last_used"]))
+            self._total_bytes = sum(entry["size"] for entry in self._entries.values())
+            print(f"✅ TTS cache loaded: {len(self._entries)} files, {self._total_bytes / 1e6:.1f} MB")
+        except FileNotFoundError:
+            self._entries = OrderedDict()
+        except Exception as e:
+            print(f"❌ Error loading TTS cache index: {e}")
+            self._entries = OrderedDict()
+
+    @contextmanager
+    def _index_lock(self):
+        """Exclusive lock on the shared index across processes."""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.lock_path, "a") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _merge_from_disk(self):
+        # Caller holds self._lock and the index lock
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                on_disk = json.load(f)
+        except (OSError, ValueError):
+            return
+        for name, entry in on_disk.items():
+            current = self._entries.get(name)
+            if current is not None:
+                current["last_used"] = max(current["last_used"], entry["last_used"])
+            elif os.path.exists(self.path(name)):
+                self._entries[name] = entry
+        self._entries = OrderedDict(sorted(self._entries.items(), key=lambda item: item[1]["last_used"]))
+        self._total_bytes = sum(entry["size"] for entry in self._entries.values())
+
+    def _write_index(self):
+        # Caller holds self._lock and the index lock
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self.index_path)
+        self._unsaved = 0
+
+    def save(self):
+        with self._index_lock(), self._lock:
+            self._merge_from_disk()
+            self._write_index()
+
+    def get(self, key: str, ext: str = "mp3") -> str | None:
+        """Cached file name for `key`, relative to `root`, or None (a missing file counts as a miss)."""
+        name = f"{key}.{ext}"
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry and not os.path.exists(self.path(name)):
+                self._total_bytes -= self._entries.pop(name)["size"]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            entry["last_used"] = time.time()
+            self._entries.move_to_end(name)
+            self.hits += 1
+        return self.relative_name(name)
+
+    def put(self, key: str, content: bytes, ext: str = "mp3") -> str:
+        """Store content under `key` (atomically) and return its file name relative to `root`."""
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"{key}.{ext}"
+        path = self.path(name)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as out:
+            out.write(content)
+        os.replace(tmp_path, path)
+
+        now = time.time()
+        with self._lock:
+            previous = self._entries.pop(name, None)
+            if previous:
+                self._total_bytes -= previous["size"]
+            self._entries[name] = {"size": len(content), "created_at": now, "last_used": now}
+            self._total_bytes += len(content)
+            self._evict_over_budget()
+            self._unsaved += 1
+            should_save = self._unsaved >= SAVE_EVERY
+        if should_save:
+            self.save()
+        return self.relative_name(name)
+
+    def _evict_over_budget(self):
+        # Caller holds self._lock
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            name, entry = self._entries.popitem(last=False)
+            self._total_bytes -= entry["size"]
+            self.evictions += 1
+            try:
+                os.remove(self.path(name))
+            except FileNotFoundError:
+                pass
+
+    def sweep(self):
+        """Reconcile the index with the files on disk, then persist it."""
+        if not os.path.isdir(self.directory):
+            return
+        now = time.time()
+        with self._index_lock(), self._lock:
+            # Files other processes indexed are not orphans
+            self._merge_from_disk()
+            for name in [name for name in self._entries if not os.path.exists(self.path(name))]:
+                self._total_bytes -= self._entries.pop(name)["size"]
+
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                if name in ("index.json", "index.lock") or not os.path.isfile(path):
+                    continue
+                if name in self._entries:
+                    continue
+                if now - os.path.getmtime(path) < ORPHAN_GRACE_SECONDS:
+                    continue
+                try:
+                    os.remove(path)
+                    self.orphans_removed += 1
+                except OSError as e:
+                    print(f"❌ TTS cache sweep error on {name}: {e}")
+
+            self._evict_over_budget()
+            self._write_index()
+        self.last_swept = datetime.datetime.now().isoformat()
+
+    async def run_sweeper(self, interval: float = TTS_CACHE_SWEEP_INTERVAL):
+        """Background task: sweep every `interval` seconds until cancelled."""
+        while True:
+            try:
+                await asyncio.to_thread(self.sweep)
+                print(f"🧹 TTS cache swept: {self.stats()}")
+            except Exception as e:
+                print(f"❌ TTS cache sweep failed: {e}")
+            await asyncio.sleep(interval)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": TTS_CACHE_ENABLED,
+            "files": len(self._entries),
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "orphans_removed": self.orphans_removed,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "last_swept": self.last_swept,
+        }
@@ -0,0 +1,127 @@
+import asyncio
+import hashlib
+import math
+import os
+import re
+from image_analysis.voice_helper import generate_voice_async, tts_cache, UPLOAD_VOICE_DIR
+
+# Tunables (override via environment)
+TTS_CHUNK_CHARS = int(os.getenv("TTS_CHUNK_CHARS", "300"))  # max characters per synthesize_speech call
+TTS_CHUNK_CONCURRENCY = int(os.getenv("TTS_CHUNK_CONCURRENCY", "4"))  # chunks synthesized at once per answer
+
+# Google TTS MP3 output bitrate, used to estimate segment durations for playlists
+MP3_BITRATE = 32000
+
+_SENTENCE_END = re.compile(r'(?<=[.!?।])\s+')
+
+
+def _split_long(sentence: str, max_chars: int) -> list[str]:
+    pieces = []
+    while len(sentence) > max_chars:
+        cut = sentence.rfind(" ", 0, max_chars)
+        if cut <= 0:
+            cut = max_chars
+        pieces.append(sentence[:cut].strip())
+        sentence = sentence[cut:].strip()
+    if sentence:
+        pieces.append(sentence)
+    return pieces
+
+
+def split_sentences(text: str, max_chars: int = TTS_CHUNK_CHARS) -> list[str]:
+    """Split text into sentence-aligned chunks of at most `max_chars`.
+
+    The first sentence always gets a chunk of its own so playback can start
+    as early as possible; later sentences are packed together up to the limit.
+    """
+    sentences = [s.strip() for s in _SENTENCE_END.split(text.replace("\\n", " ")) if s.strip()]
+    chunks = []
+    current = ""
+    for sentence in sentences:
+        for piece in _split_long(sentence, max_chars):
+            if not chunks and not current:
+                chunks.append(piece)
+            elif current and len(current) + 1 + len(piece) > max_chars:
+                chunks.append(current)
+                current = piece
+            else:
+                current = f"{current} {piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+async def iter_voice_chunks(text: str, lang: str = "hi", **voice_options):
+    """Yield the voice file of each chunk of `text`, in order.
+
+    All chunks are synthesized concurrently (at most TTS_CHUNK_CONCURRENCY at
+    a time) through generate_voice_async, so each chunk is also served from
+    the TTS cache on repeats. Yields None for a chunk whose synthesis failed.
+    """
+    semaphore = asyncio.Semaphore(max(1, TTS_CHUNK_CONCURRENCY))
+
+    async def synthesize(chunk: str):
+        async with semaphore:
+            return await generate_voice_async(chunk, lang=lang, **voice_options)
+
+    tasks = [asyncio.create_task(synthesize(chunk)) for chunk in split_sentences(text)]
+    try:
+        for task in tasks:
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def read_voice(voice_file: str) -> bytes:
+    with open(os.path.join(UPLOAD_VOICE_DIR, voice_file), "rb") as f:
+        return f.read()
+
+
+def build_playlist(segments: list[str]) -> str:
+    """HLS (m3u8) VOD playlist over the segment MP3s."""
+    durations = [os.path.getsize(os.path.join(UPLOAD_VOICE_DIR, segment)) * 8 / MP3_BITRATE for segment in segments]
+    lines = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:3",
+        f"#EXT-X-TARGETDURATION:{math.ceil(max(durations))}",
+        "#EXT-X-MEDIA-SEQUENCE:0",
+        "#EXT-X-PLAYLIST-TYPE:VOD",
+    ]
+    for segment, duration in zip(segments, durations):
+        lines.append(f"#EXTINF:{duration:.2f},")
+        lines.append(f"/uploadvoices/{segment}")
+    lines.append("#EXT-X-ENDLIST")
+    return "\n".join(lines) + "\n"
+
+
+def stitch_segments(segments: list[str]) -> dict:
+    """Concatenate segment MP3s into one cached file and write a playlist for them.
+
+    MP3 is a sequence of self-contained frames, so the segments (same voice
+    and encoding) can be joined byte for byte.
+    """
+    if len(segments) == 1:
+        return {"voice_file": segments[0], "playlist_file": None, "segments": segments}
+
+    key = hashlib.sha256("|".join(segments).encode("utf-8")).hexdigest()
+    voice_file = tts_cache.get(key) or tts_cache.put(key, b"".join(read_voice(segment) for segment in segments))
+    playlist_file = tts_cache.get(key, ext="m3u8") or tts_cache.put(key, build_playlist(segments).encode("utf-8"), ext="m3u8")
+    return {"voice_file": voice_file, "playlist_file": playlist_file, "segments": segments}
+
+
+async def generate_long_voice(text: str, lang: str = "hi", **voice_options) -> dict | None:
+    """Chunked, parallel counterpart of generate_voice_async for long answers.
+
+    Returns {"voice_file", "playlist_file", "segments"} (paths under
+    UPLOAD_VOICE_DIR), or None if any chunk failed.
+    """
+    segments = [segment async for segment in iter_voice_chunks(text, lang=lang, **voice_options)]
+    if not segments or None in segments:
+        return None
+    try:
+        return await asyncio.to_thread(stitch_segments, segments)
+    except OSError as e:
+        # A segment can be evicted from the TTS cache between synthesis and stitching
+        print(f"❌ Voice stitching failed: {e}")
+        return None
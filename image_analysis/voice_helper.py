@@ -1,32 +1,31 @@
+import asyncio
 import uuid
 import os
 from google.cloud import texttospeech
 import re
+from cloud_clients import client_registry
+from image_analysis.tts_cache import TTSCache, make_tts_key, TTS_CACHE_ENABLED
 
 UPLOAD_VOICE_DIR = "uploadvoices"
 os.makedirs(UPLOAD_VOICE_DIR, exist_ok=True)
 
+# Content-addressed store of synthesized speech, shared by every generate_voice caller
+tts_cache = TTSCache(UPLOAD_VOICE_DIR)
+
 def clean_label_for_voice(label_text: str) -> str:
     """Clean label text for natural speech (e.g., 'Tomato__Late_blight' -> 'Tomato Late Blight')."""
     text = label_text.replace("_", " ").replace(",", " ")
     text = " ".join(text.split())  # Remove extra spaces
     return text
 
-def generate_voice(
-    summary_text: str, 
-    lang: str = "hi", 
-    use_ssml: bool = False,  # Optional SSML for pronunciation hints
-    custom_rate: float = None,  # Optional speaking rate override
-    custom_pitch: float = None   # Optional pitch override
-) -> str:
-    """Generate human-like voice audio using Google Cloud TTS.
-    
-    Backward-compatible: Defaults to plain text (no SSML) and standard config.
-    For enhanced pronunciation (e.g., Hindi/Punjabi), set use_ssml=True.
-    """
-    voice_filename = f"{uuid.uuid4().hex}.mp3"
-    file_path = os.path.join(UPLOAD_VOICE_DIR, voice_filename)
-
+def build_tts_request(
+    summary_text: str,
+    lang: str = "hi",
+    use_ssml: bool = False,
+    custom_rate: float = None,
+    custom_pitch: float = None
+) -> dict:
+    """Keyword arguments for `synthesize_speech`: cleaned (optionally SSML) input, voice and audio config."""
     # Map app's lang codes to Google Cloud TTS voice settings
     voice_map = {
         'hi': {'language_code': 'hi-IN', 'name': 'hi-IN-Wavenet-A', 'ssml_gender': 'FEMALE'},
@@ -37,52 +36,106 @@ def generate_voice(
     }
     voice_config = voice_map.get(lang, voice_map['hi'])  # Default to Hindi for Hinglish
 
-    try:
-        # Clean the text (always, for compatibility)
-        cleaned_text = re.sub(r'\\n', ' ', summary_text)  # Replace \n with space
-        cleaned_text = re.sub(r'\s+', ' ', cleaned_text)  # Normalize multiple spaces
-        cleaned_text = re.sub(r'[^\w\s.,!?]', '', cleaned_text)  # Keep only letters, numbers, and basic punctuation
-        cleaned_text = cleaned_text.strip()  # Remove leading/trailing spaces
+    # Clean the text (always, for compatibility)
+    cleaned_text = re.sub(r'\\n', ' ', summary_text)  # Replace \n with space
+    cleaned_text = re.sub(r'\s+', ' ', cleaned_text)  # Normalize multiple spaces
+    cleaned_text = re.sub(r'[^\w\s.,!?]', '', cleaned_text)  # Keep only letters, numbers, and basic punctuation
+    cleaned_text = cleaned_text.strip()  # Remove leading/trailing spaces
 
-        # SSML enhancement (optional)
-        input_text = cleaned_text
-        if use_ssml:
-            ssml_text = f"<speak>{cleaned_text}</speak>"
-            # Add phonetic hints for specific words (language-specific)
-            if lang in ['hi', 'hinglish']:
-                ssml_text = ssml_text.replace("Diplocarpon", "<phoneme alphabet='ipa' ph='dɪploʊˈkɑːrpən'>Diplocarpon</phoneme>")
-                # Add more: e.g., ssml_text = ssml_text.replace("patton", "<phoneme alphabet='ipa' ph='pət̪ən'>patton</phoneme>")
-            elif lang == 'pa':
-                ssml_text = ssml_text.replace("ਸੰਭਾਲ", "<phoneme alphabet='ipa' ph='səmˈbʱaːl'>ਸੰਭਾਲ</phoneme>")
-                # Add more Punjabi words as needed
-            input_text = ssml_text  # Use SSML if enabled
+    # SSML enhancement (optional)
+    input_text = cleaned_text
+    if use_ssml:
+        ssml_text = f"<speak>{cleaned_text}</speak>"
+        # Add phonetic hints for specific words (language-specific)
+        if lang in ['hi', 'hinglish']:
+            ssml_text = ssml_text.replace("Diplocarpon", "<phoneme alphabet='ipa' ph='dɪploʊˈkɑːrpən'>Diplocarpon</phoneme>")
+            # Add more: e.g., ssml_text = ssml_text.replace("patton", "<phoneme alphabet='ipa' ph='pət̪ən'>patton</phoneme>")
+        elif lang == 'pa':
+            ssml_text = ssml_text.replace("ਸੰਭਾਲ", "<phoneme alphabet='ipa' ph='səmˈbʱaːl'>ਸੰਭਾਲ</phoneme>")
+            # Add more Punjabi words as needed
+        input_text = ssml_text  # Use SSML if enabled
 
-        client = texttospeech.TextToSpeechClient()
-        synthesis_input = texttospeech.SynthesisInput(ssml=input_text if use_ssml else cleaned_text)  # SSML or plain
+    synthesis_input = texttospeech.SynthesisInput(ssml=input_text if use_ssml else cleaned_text)  # SSML or plain
 
-        voice = texttospeech.VoiceSelectionParams(
-            language_code=voice_config['language_code'],
-            name=voice_config['name'],
-            ssml_gender=texttospeech.SsmlVoiceGender[voice_config['ssml_gender']]
-        )
+    voice = texttospeech.VoiceSelectionParams(
+        language_code=voice_config['language_code'],
+        name=voice_config['name'],
+        ssml_gender=texttospeech.SsmlVoiceGender[voice_config['ssml_gender']]
+    )
 
-        # Audio config with optional overrides
-        base_rate = 0.95 if lang in ['hi', 'hinglish', 'pa'] else 1.0
-        base_pitch = -0.5 if lang in ['hi', 'hinglish', 'pa'] else 0.0
-        audio_config = texttospeech.AudioConfig(
-            audio_encoding=texttospeech.AudioEncoding.MP3,
-            speaking_rate=custom_rate or base_rate,  # Use custom if provided, else base
-            pitch=custom_pitch or base_pitch        # Use custom if provided, else base
-        )
+    # Audio config with optional overrides
+    base_rate = 0.95 if lang in ['hi', 'hinglish', 'pa'] else 1.0
+    base_pitch = -0.5 if lang in ['hi', 'hinglish', 'pa'] else 0.0
+    audio_config = texttospeech.AudioConfig(
+        audio_encoding=texttospeech.AudioEncoding.MP3,
+        speaking_rate=custom_rate or base_rate,  # Use custom if provided, else base
+        pitch=custom_pitch or base_pitch        # Use custom if provided, else base
+    )
+    return {"input": synthesis_input, "voice": voice, "audio_config": audio_config}
 
-        response = client.synthesize_speech(
-            input=synthesis_input, voice=voice, audio_config=audio_config
-        )
+def _cache_key(request: dict, output_name: str = None) -> str | None:
+    # Callers asking for a fixed output path manage that file themselves
+    if not TTS_CACHE_ENABLED or output_name:
+        return None
+    return make_tts_key(request)
 
+def _store_voice(audio_content: bytes, cache_key: str = None, output_name: str = None, use_ssml: bool = False) -> str:
+    """Write synthesized audio to the TTS cache (or to `output_name`/a random name) and return its path under UPLOAD_VOICE_DIR."""
+    if cache_key:
+        voice_filename = tts_cache.put(cache_key, audio_content)
+    else:
+        voice_filename = output_name or f"{uuid.uuid4().hex}.mp3"
+        file_path = os.path.join(UPLOAD_VOICE_DIR, voice_filename)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
         with open(file_path, 'wb') as out:
-            out.write(response.audio_content)
-        print(f"✅ Voice file generated: {file_path} (SSML: {use_ssml})")
-        return voice_filename
+            out.write(audio_content)
+    print(f"✅ Voice file generated: {os.path.join(UPLOAD_VOICE_DIR, voice_filename)} (SSML: {use_ssml})")
+    return voice_filename
+
+def generate_voice(
+    summary_text: str, 
+    lang: str = "hi", 
+    use_ssml: bool = False,  # Optional SSML for pronunciation hints
+    custom_rate: float = None,  # Optional speaking rate override
+    custom_pitch: float = None,  # Optional pitch override
+    output_name: str = None      # Optional path under UPLOAD_VOICE_DIR (default: random name)
+) -> str:
+    """Generate human-like voice audio using Google Cloud TTS.
+    
+    Backward-compatible: Defaults to plain text (no SSML) and standard config.
+    For enhanced pronunciation (e.g., Hindi/Punjabi), set use_ssml=True.
+    """
+    try:
+        request = build_tts_request(summary_text, lang, use_ssml, custom_rate, custom_pitch)
+        cache_key = _cache_key(request, output_name)
+        if cache_key and (cached := tts_cache.get(cache_key)):
+            print(f"✅ Voice served from TTS cache: {cached}")
+            return cached
+
+        response = client_registry.get("tts").synthesize_speech(**request)
+        return _store_voice(response.audio_content, cache_key, output_name, use_ssml)
+    except Exception as e:
+        print(f"❌ TTS failed: {e}")
+        return None
+
+async def generate_voice_async(
+    summary_text: str,
+    lang: str = "hi",
+    use_ssml: bool = False,
+    custom_rate: float = None,
+    custom_pitch: float = None,
+    output_name: str = None
+) -> str:
+    """Async variant of `generate_voice` on the shared asyncio TTS client (same arguments and result)."""
+    try:
+        request = build_tts_request(summary_text, lang, use_ssml, custom_rate, custom_pitch)
+        cache_key = _cache_key(request, output_name)
+        if cache_key and (cached := tts_cache.get(cache_key)):
+            print(f"✅ Voice served from TTS cache: {cached}")
+            return cached
+
+        response = await client_registry.get_async("tts").synthesize_speech(**request)
+        return await asyncio.to_thread(_store_voice, response.audio_content, cache_key, output_name, use_ssml)
     except Exception as e:
         print(f"❌ TTS failed: {e}")
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,288 @@
+import asyncio
+import multiprocessing
+import os
+from multiprocessing import shared_memory
+import numpy as np
+from image_analysis import prediction
+from image_analysis.prediction import IMG_SIZE
+
+# Tunables (override via environment)
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "0"))  # 0 = run inference in the API process
+WORKER_MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "16"))
+WORKER_START_TIMEOUT = float(os.getenv("INFERENCE_WORKER_START_TIMEOUT", "300"))  # seconds
+WORKER_DRAIN_TIMEOUT = float(os.getenv("INFERENCE_WORKER_DRAIN_TIMEOUT", "60"))  # seconds to wait for an abandoned reply
+WORKER_RESPAWN_ATTEMPTS = int(os.getenv("INFERENCE_WORKER_RESPAWN_ATTEMPTS", "5"))  # per broken worker
+WORKER_RESPAWN_BACKOFF = float(os.getenv("INFERENCE_WORKER_RESPAWN_BACKOFF", "2"))  # seconds before the first retry, doubling
+
+
+def _worker_main(conn, shm_name: str, max_batch_size: int, num_threads: int):
+    """Entry point of an inference process: one model copy, input read from shared memory."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    buffer = np.ndarray((max_batch_size, *IMG_SIZE, 3), dtype=np.float32, buffer=shm.buf)
+    try:
+        # Split the cores between workers instead of every process using all of them
+        try:
+            import tensorflow as tf
+            tf.config.threading.set_intra_op_parallelism_threads(num_threads)
+            tf.config.threading.set_inter_op_parallelism_threads(1)
+        except Exception as e:
+            print(f"⚠️ Could not set TensorFlow thread counts: {e}")
+
+        conn.send(("ready", prediction.warm_up(), prediction.model_error))
+        while True:
+            count = conn.recv()
+            if count is None:
+                break
+            try:
+                conn.send(("ok", prediction.predict_batch(buffer[:count])))
+            except Exception as e:
+                conn.send(("error", str(e)))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        del buffer
+        shm.close()
+
+
+async def _recv(conn):
+    """Await one message on a pipe without tying up a thread-pool thread."""
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    fd = conn.fileno()
+
+    def on_readable():
+        loop.remove_reader(fd)
+        if future.done():
+            return
+        try:
+            future.set_result(conn.recv())
+        except Exception as e:
+            future.set_exception(e)
+
+    loop.add_reader(fd, on_readable)
+    try:
+        return await future
+    finally:
+        loop.remove_reader(fd)
+
+
+class InferenceWorker:
+    """Handle on one inference process and the shared-memory input buffer it reads from."""
+
+    def __init__(self, index: int, max_batch_size: int, num_threads: int):
+        self.index = index
+        self.max_batch_size = max_batch_size
+        self.shm = shared_memory.SharedMemory(create=True, size=max_batch_size * IMG_SIZE[0] * IMG_SIZE[1] * 3 * 4)
+        self.buffer = np.ndarray((max_batch_size, *IMG_SIZE, 3), dtype=np.float32, buffer=self.shm.buf)
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.get_context("spawn").Process(
+            target=_worker_main,
+            args=(child_conn, self.shm.name, max_batch_size, num_threads),
+            name=f"inference-worker-{index}",
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.batches = 0
+        self.pending = False  # a batch was sent whose reply has not been read yet
+
+    async def wait_ready(self) -> bool:
+        _, ok, error = await asyncio.wait_for(_recv(self.conn), WORKER_START_TIMEOUT)
+        if not ok:
+            print(f"❌ Inference worker {self.index} failed to load the model: {error}")
+        return ok
+
+    async def predict(self, images: list) -> list[dict]:
+        """Copy images into shared memory (casting to float32) and run them as one batch."""
+        if len(images) > self.max_batch_size:
+            raise ValueError(f"Batch of {len(images)} exceeds worker buffer of {self.max_batch_size}")
+        for i, img in enumerate(images):
+            np.copyto(self.buffer[i], img[0] if img.ndim == 4 else img, casting='unsafe')
+
+        # Only the image count crosses the pipe; the tensors are already in shared memory
+        self.pending = True
+        self.conn.send(len(images))
+        status, payload = await _recv(self.conn)
+        self.pending = False
+        if status != "ok":
+            raise RuntimeError(f"Inference worker {self.index} failed: {payload}")
+        self.batches += 1
+        return payload
+
+    def is_alive(self) -> bool:
+        return self.process.is_alive() and not self.conn.closed
+
+    async def drain(self) -> bool:
+        """Read and discard the reply to an abandoned batch, so the next batch gets its own."""
+        try:
+            await asyncio.wait_for(_recv(self.conn), WORKER_DRAIN_TIMEOUT)
+        except Exception:
+            return False
+        self.pending = False
+        return True
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except Exception:
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.conn.close()
+        del self.buffer
+        self.shm.close()
+        self.shm.unlink()
+
+
+class InferencePool:
+    """Pool of inference processes, each holding one model copy.
+
+    Callers borrow an idle worker, so at most one batch runs per process
+    and throughput scales with the number of workers (and cores). A broken
+    worker is restarted with backoff; once no worker is left and none is
+    being restarted, the pool is exhausted: `acquire()` raises instead of
+    waiting forever, and `on_exhausted(error)` is called once.
+    """
+
+    def __init__(self, num_workers: int = INFERENCE_WORKERS, max_batch_size: int = WORKER_MAX_BATCH_SIZE):
+        self.num_workers = max(1, num_workers)
+        self.max_batch_size = max_batch_size
+        self.num_threads = 1
+        self.workers = []
+        self._idle = asyncio.Queue()  # idle workers; None once the pool is exhausted
+        self._tasks = set()  # background drains and respawns
+        self._restarting = 0
+        self.exhausted = False
+        self.closed = False
+        self.error = None
+        self.on_exhausted = None
+        self.respawns = 0
+
+    async def start(self) -> bool:
+        """Spawn the workers and wait until every one has warmed up its model."""
+        self.num_threads = max(1, (os.cpu_count() or 1) // self.num_workers)
+        workers = [InferenceWorker(i, self.max_batch_size, self.num_threads) for i in range(self.num_workers)]
+
+        results = await asyncio.gather(*(worker.wait_ready() for worker in workers), return_exceptions=True)
+        for worker, ok in zip(workers, results):
+            if ok is True:
+                self.workers.append(worker)
+                self._idle.put_nowait(worker)
+            else:
+                # Don't leak the process and shared-memory segment of a worker that never came up
+                await asyncio.to_thread(worker.close)
+        ready = len(self.workers)
+        print(f"✅ Inference pool: {ready}/{self.num_workers} worker(s) ready, {self.num_threads} thread(s) each")
+        if not ready:
+            self._exhaust(prediction.model_error or "No inference worker could load the model")
+        return ready > 0
+
+    async def acquire(self) -> InferenceWorker:
+        """Wait for an idle worker; raises RuntimeError if the pool is exhausted."""
+        worker = await self._idle.get()
+        if worker is None:
+            self._idle.put_nowait(None)  # wake the next waiter too
+            raise RuntimeError(f"No inference worker available: {self.error}")
+        return worker
+
+    def _exhaust(self, error: str):
+        if self.exhausted or self.closed:
+            return
+        self.exhausted = True
+        self.error = error
+        print(f"❌ Inference pool exhausted: {error}")
+        self._idle.put_nowait(None)
+        if self.on_exhausted is not None:
+            self.on_exhausted(error)
+
+    def release(self, worker: InferenceWorker):
+        """Return a worker to the pool; a dead one is replaced, one with an unread reply is drained first."""
+        if worker not in self.workers:
+            return
+        if not worker.is_alive():
+            self._spawn_task(self._replace(worker))
+        elif worker.pending:
+            self._spawn_task(self._drain_and_release(worker))
+        else:
+            self._idle.put_nowait(worker)
+
+    def _spawn_task(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _drain_and_release(self, worker: InferenceWorker):
+        if await worker.drain():
+            self.release(worker)
+        else:
+            await self._replace(worker)
+
+    async def _replace(self, worker: InferenceWorker):
+        """Retire a broken worker and start a fresh process in its place, retrying with backoff."""
+        print(f"⚠️ Inference worker {worker.index} is unusable, restarting it")
+        if worker in self.workers:
+            self.workers.remove(worker)
+        self._restarting += 1
+        try:
+            await asyncio.to_thread(worker.close)
+            for attempt in range(WORKER_RESPAWN_ATTEMPTS):
+                if attempt:
+                    await asyncio.sleep(WORKER_RESPAWN_BACKOFF * 2 ** (attempt - 1))
+                replacement = None
+                try:
+                    replacement = InferenceWorker(worker.index, self.max_batch_size, self.num_threads)
+                    ok = await replacement.wait_ready()
+                except Exception as e:
+                    print(f"❌ Inference worker {worker.index} failed to restart: {e}")
+                    ok = False
+                if ok:
+                    self.respawns += 1
+                    self.workers.append(replacement)
+                    self._idle.put_nowait(replacement)
+                    return
+                if replacement is not None:
+                    await asyncio.to_thread(replacement.close)
+            print(f"❌ Inference worker {worker.index} gave up after {WORKER_RESPAWN_ATTEMPTS} restart attempt(s)")
+        finally:
+            self._restarting -= 1
+            if not self.workers and not self._restarting:
+                self._exhaust(prediction.model_error or "Every inference worker failed and could not be restarted")
+
+    async def predict_batch(self, images: list) -> list[dict]:
+        worker = await self.acquire()
+        try:
+            return await worker.predict(images)
+        finally:
+            self.release(worker)
+
+    async def model_predict(self, image) -> dict:
+        """Async counterpart of `prediction.model_predict`: accepts an image path or a preprocessed array."""
+        if isinstance(image, str):
+            image = await asyncio.to_thread(prediction.extract_features, image)
+            if image is None:
+                return {"cause": "Could not process the image.", "cure": "Please try with a different image."}
+        return (await self.predict_batch([image]))[0]
+
+    def close(self, reason: str = "Inference pool is closed"):
+        """Stop every worker; later `acquire()` calls raise with `reason`."""
+        if not self.exhausted:
+            self.exhausted = True
+            self.error = reason
+            self._idle.put_nowait(None)
+        self.closed = True
+        for task in self._tasks:
+            task.cancel()
+        for worker in self.workers:
+            worker.close()
+        self.workers = []
+
+    def stats(self) -> dict:
+        return {
+            "workers": len(self.workers),
+            "idle_workers": max(0, self._idle.qsize() - self.exhausted),
+            "batches_per_worker": [worker.batches for worker in self.workers],
+            "restarting": self._restarting,
+            "respawns": self.respawns,
+            "exhausted": self.exhausted,
+        }
@@ -0,0 +1,180 @@
+import json
+import math
+import os
+import threading
+import time
+from pathlib import Path
+
+# Tunables (override via environment)
+DISTRICT_BOUNDARIES_PATH = os.getenv("DISTRICT_BOUNDARIES_PATH", "district-boundaries.geojson")
+GEOCODER_GRID_DEGREES = float(os.getenv("GEOCODER_GRID_DEGREES", "0.25"))  # bucket size; ~28 km at the equator
+
+# Property names used for state and district by the common India boundary datasets
+STATE_PROPERTIES = ("st_nm", "ST_NM", "state", "STATE", "NAME_1", "stname")
+DISTRICT_PROPERTIES = ("district", "DISTRICT", "dtname", "NAME_2", "district_name")
+
+
+def _first_property(properties: dict, names) -> str | None:
+    for name in names:
+        value = properties.get(name)
+        if value:
+            return str(value)
+    return None
+
+
+def _ring_contains(ring: list, lon: float, lat: float) -> bool:
+    """Even-odd ray casting test of (lon, lat) against one closed ring."""
+    inside = False
+    j = len(ring) - 1
+    for i in range(len(ring)):
+        xi, yi = ring[i][0], ring[i][1]
+        xj, yj = ring[j][0], ring[j][1]
+        if (yi > lat) != (yj > lat) and lon < (xj - xi) * (lat - yi) / (yj - yi) + xi:
+            inside = not inside
+        j = i
+    return inside
+
+
+class _Region:
+    __slots__ = ("state", "district", "polygons", "bbox")
+
+    def __init__(self, state: str, district: str, polygons: list):
+        self.state = state
+        self.district = district
+        self.polygons = polygons  # [[outer ring, *holes], ...] in GeoJSON (lon, lat) order
+        lons = [point[0] for polygon in polygons for point in polygon[0]]
+        lats = [point[1] for polygon in polygons for point in polygon[0]]
+        self.bbox = (min(lons), min(lats), max(lons), max(lats))
+
+    def contains(self, lon: float, lat: float) -> bool:
+        min_lon, min_lat, max_lon, max_lat = self.bbox
+        if not (min_lon <= lon <= max_lon and min_lat <= lat <= max_lat):
+            return False
+        for outer, *holes in self.polygons:
+            if _ring_contains(outer, lon, lat) and not any(_ring_contains(hole, lon, lat) for hole in holes):
+                return True
+        return False
+
+
+class ReverseGeocoder:
+    """In-process (lat, lon) -> state/district lookup over district boundary polygons.
+
+    Boundaries come from a GeoJSON FeatureCollection of Polygon/MultiPolygon
+    districts. Each district is registered in every grid bucket its bounding
+    box overlaps, so a lookup only tests the few polygons in the point's
+    bucket: a bounding-box check, then a point-in-polygon test. The file is
+    loaded on first use (or by `load()` at startup); without it every
+    lookup misses and callers fall back to Nominatim.
+    """
+
+    def __init__(self, path: str = DISTRICT_BOUNDARIES_PATH, grid_degrees: float = GEOCODER_GRID_DEGREES):
+        self.path = Path(path)
+        self.grid_degrees = grid_degrees
+        self._regions = []
+        self._grid = {}  # (row, col) -> [_Region]
+        self.loaded = False
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.lookups = 0
+        self.hits = 0
+        self.load_seconds = None
+
+    def _bucket(self, lon: float, lat: float) -> tuple[int, int]:
+        return math.floor(lat / self.grid_degrees), math.floor(lon / self.grid_degrees)
+
+    def load(self):
+        """Read the boundary file and build the grid index.
+
+        A missing or unreadable file leaves the index empty and malformed
+        features are skipped; either way the file is read only once.
+        """
+        with self._lock:
+            if self.loaded:
+                return
+            start = time.time()
+            try:
+                with self.path.open("r", encoding="utf-8") as f:
+                    collection = json.load(f)
+                features = collection.get("features", []) if isinstance(collection, dict) else []
+            except FileNotFoundError:
+                features = []
+                print(f"⚠️ No district boundaries at {self.path}; reverse geocoding will use Nominatim")
+            except (OSError, ValueError) as e:
+                features = []
+                print(f"❌ Could not read district boundaries from {self.path}: {e}")
+
+            skipped = 0
+            for feature in features if isinstance(features, list) else []:
+                try:
+                    self.add_feature(feature)
+                except Exception:
+                    skipped += 1
+            # Never retried: a bad file must not make every lookup re-read it
+            self.loaded = True
+            self.load_seconds = round(time.time() - start, 3)
+            if skipped:
+                print(f"⚠️ Skipped {skipped} malformed district feature(s) in {self.path}")
+            if self._regions:
+                print(f"✅ Reverse geocoder indexed {len(self._regions)} district(s) in {len(self._grid)} bucket(s), "
+                      f"{self.load_seconds:.2f}s")
+
+    def add_feature(self, feature: dict):
+        """Index one GeoJSON district feature; features without a usable geometry or name are skipped.
+
+        Raises on malformed coordinates without changing the index.
+        """
+        geometry = feature.get("geometry") or {}
+        properties = feature.get("properties") or {}
+        if geometry.get("type") == "Polygon":
+            polygons = [geometry.get("coordinates")]
+        elif geometry.get("type") == "MultiPolygon":
+            polygons = geometry.get("coordinates")
+        else:
+            return
+        polygons = [polygon for polygon in polygons or [] if polygon and len(polygon[0]) >= 3]
+        district = _first_property(properties, DISTRICT_PROPERTIES)
+        if not polygons or not district:
+            return
+
+        # Validate every coordinate before touching the index, so a bad feature leaves no partial entries
+        polygons = [[[(float(point[0]), float(point[1])) for point in ring] for ring in polygon] for polygon in polygons]
+        region = _Region(_first_property(properties, STATE_PROPERTIES) or "Unknown", district, polygons)
+        min_lon, min_lat, max_lon, max_lat = region.bbox
+        min_row, min_col = self._bucket(min_lon, min_lat)
+        max_row, max_col = self._bucket(max_lon, max_lat)
+        self._regions.append(region)
+        for row in range(min_row, max_row + 1):
+            for col in range(min_col, max_col + 1):
+                self._grid.setdefault((row, col), []).append(region)
+
+    def lookup(self, lat: float, lon: float) -> dict | None:
+        """{"state", "district"} of the district containing (lat, lon), or None if none does."""
+        if not self.loaded:
+            self.load()
+        self.lookups += 1
+        for region in self._grid.get(self._bucket(lon, lat), ()):
+            if region.contains(lon, lat):
+                self.hits += 1
+                return {"state": region.state, "district": region.district}
+        return None
+
+    def lookup_many(self, points) -> list[dict | None]:
+        """`lookup` for each (lat, lon) in `points`, in order."""
+        return [self.lookup(lat, lon) for lat, lon in points]
+
+    def stats(self) -> dict:
+        return {
+            "loaded": self.loaded,
+            "path": str(self.path),
+            "districts": len(self._regions),
+            "buckets": len(self._grid),
+            "grid_degrees": self.grid_degrees,
+            "load_seconds": self.load_seconds,
+            "lookups": self.lookups,
+            "hits": self.hits,
+        }
+
+
+# Shared geocoder for registration and anything else resolving coordinates
+reverse_geocoder = ReverseGeocoder()
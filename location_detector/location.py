@@ -1,19 +1,57 @@
+import asyncio
+import os
 import requests
+from location_detector.geocoder import reverse_geocoder
 
-def get_location_from_coords(lat: float, lon: float) -> dict:
+# Tunables (override via environment)
+NOMINATIM_FALLBACK = os.getenv("NOMINATIM_FALLBACK", "true").lower() == "true"  # when the local index has no match
+NOMINATIM_TIMEOUT = float(os.getenv("NOMINATIM_TIMEOUT", "5"))  # seconds
+
+UNKNOWN_LOCATION = {"state": "Unknown", "district": "Unknown"}
+
+
+def get_location_from_nominatim(lat: float, lon: float) -> dict:
     url = f"https://nominatim.openstreetmap.org/reverse?lat={lat}&lon={lon}&format=json"
     try:
-        resp = requests.get(url, headers={"User-Agent": "farmer-app"})
+        resp = requests.get(url, headers={"User-Agent": "farmer-app"}, timeout=NOMINATIM_TIMEOUT)
         resp.raise_for_status()
         data = resp.json()
         address = data.get("address", {})
         state = address.get("state", "Unknown")
         district = (
-            address.get("county") or 
-            address.get("state_district") or 
+            address.get("county") or
+            address.get("state_district") or
             "Unknown"
         )
         return {"state": state, "district": district}
     except Exception as e:
         print("Error fetching location:", str(e))
-        return {"state": "Unknown", "district": "Unknown"}
+        return dict(UNKNOWN_LOCATION)
+
+
+def get_location_from_coords(lat: float, lon: float) -> dict:
+    """State and district for (lat, lon) from the local boundary index, falling back to Nominatim."""
+    location = reverse_geocoder.lookup(lat, lon)
+    if location:
+        return location
+    return get_location_from_nominatim(lat, lon) if NOMINATIM_FALLBACK else dict(UNKNOWN_LOCATION)
+
+
+async def get_location_from_coords_async(lat: float, lon: float) -> dict:
+    """Async `get_location_from_coords`; loading the index and the Nominatim fallback run in a thread, off the event loop."""
+    if not reverse_geocoder.loaded:
+        await asyncio.to_thread(reverse_geocoder.load)
+    location = reverse_geocoder.lookup(lat, lon)
+    if location:
+        return location
+    if not NOMINATIM_FALLBACK:
+        return dict(UNKNOWN_LOCATION)
+    return await asyncio.to_thread(get_location_from_nominatim, lat, lon)
+
+
+def get_locations_from_coords(points) -> list[dict]:
+    """Batch `get_location_from_coords` for a list of (lat, lon); only misses go to Nominatim."""
+    return [
+        location or (get_location_from_nominatim(lat, lon) if NOMINATIM_FALLBACK else dict(UNKNOWN_LOCATION))
+        for (lat, lon), location in zip(points, reverse_geocoder.lookup_many(points))
+    ]
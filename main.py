@@ -1,5 +1,8 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
+import asyncio
 from auth.routes import router as auth_router
 from chatbot.routes import router as chatbot_router
 from weather.routes import router as weather_router
@@ -7,10 +10,49 @@ from image_analysis.routes import router as image_router
 from micro_calculator.routes import router as micro_router
 from fastapi.staticfiles import StaticFiles
 from news.routes import router as news_router
+from auth.database import client as mongo_client
+from chatbot.app import API_KEY
+from image_analysis import lifecycle as image_lifecycle
+from chatbot.gemini_client import close_client as close_gemini_client
+from weather.services import close_client as close_weather_client
+from weather.prewarm import run_prewarmer, WEATHER_PREWARM
+from weather.snapshots import dashboard_snapshots
+from location_detector.geocoder import reverse_geocoder
+from cloud_clients import client_registry, CLOUD_CLIENT_PRELOAD
+from image_analysis.voice_helper import tts_cache
+from image_analysis.tts_cache import TTS_CACHE_ENABLED
 
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the image model in the background so the API starts serving immediately;
+    # /ready reports when it is warm
+    model_task = None
+    if image_lifecycle.PRELOAD_MODEL or image_lifecycle.NUM_WORKERS:
+        model_task = asyncio.create_task(image_lifecycle.start_image_analysis())
+    # Same for the TTS/STT gRPC channels, so the first voice request skips their setup
+    clients_task = asyncio.create_task(client_registry.preload()) if CLOUD_CLIENT_PRELOAD else None
+    sweeper_task = asyncio.create_task(tts_cache.run_sweeper()) if TTS_CACHE_ENABLED else None
+    # Keep weather for every registered user's cell fresh, so dashboards read it locally
+    prewarm_task = asyncio.create_task(run_prewarmer()) if WEATHER_PREWARM else None
+    # Rebuild dashboard snapshots before they expire, so repeat opens are served from memory
+    snapshot_task = asyncio.create_task(dashboard_snapshots.run_refresher())
+    # Build the district boundary index now rather than on the first registration
+    geocoder_task = asyncio.create_task(asyncio.to_thread(reverse_geocoder.load))
+    yield
+    for task in (model_task, clients_task, sweeper_task, prewarm_task, snapshot_task, geocoder_task):
+        if task and not task.done():
+            task.cancel()
+    if TTS_CACHE_ENABLED:
+        tts_cache.save()
+    await image_lifecycle.stop_image_analysis()
+    await close_gemini_client()
+    await close_weather_client()
+    await client_registry.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.mount("/uploadvoices", StaticFiles(directory="uploadvoices"), name="uploadvoices")
 app.mount("/uploadimages", StaticFiles(directory="uploadimages"), name="uploadimages")
@@ -35,4 +77,22 @@ app.include_router(micro_router, prefix="/micro-calculator", tags=["calculator"]
 
 @app.get("/")
 async def root():
-    return {"message": "Farmer Chatbot Backend is running"}
\ No newline at end of file
+    return {"message": "Farmer Chatbot Backend is running"}
+
+@app.get("/ready")
+async def ready():
+    """Per-subsystem readiness; 503 until every required subsystem is up."""
+    subsystems = {"image_model": image_lifecycle.readiness()}
+
+    try:
+        await asyncio.wait_for(mongo_client.admin.command("ping"), timeout=2)
+        subsystems["database"] = {"status": "ready"}
+    except Exception as e:
+        subsystems["database"] = {"status": "failed", "error": str(e) or type(e).__name__}
+
+    subsystems["gemini"] = {"status": "ready" if API_KEY and API_KEY != "YOUR_API_KEY" else "not_configured"}
+    subsystems["geocoder"] = {"status": "ready" if reverse_geocoder.loaded else "loading", **reverse_geocoder.stats()}
+    subsystems["cloud_clients"] = {"status": "ready" if client_registry.stats()["clients"] else "lazy", **client_registry.stats()}
+
+    is_ready = subsystems["image_model"]["status"] in ("ready", "lazy") and subsystems["database"]["status"] == "ready"
+    return JSONResponse(status_code=200 if is_ready else 503, content={"ready": is_ready, "subsystems": subsystems})
\ No newline at end of file
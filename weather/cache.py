@@ -0,0 +1,102 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+
+# Tunables (override via environment)
+WEATHER_CACHE_TTL = int(os.getenv("WEATHER_CACHE_TTL", "1800"))  # seconds a reading is fresh
+WEATHER_STALE_TTL = int(os.getenv("WEATHER_STALE_TTL", "21600"))  # further seconds it may be served while refreshing
+WEATHER_CACHE_SIZE = int(os.getenv("WEATHER_CACHE_SIZE", "10000"))
+
+
+class WeatherCache:
+    """TTL cache with stale-while-revalidate and a per-key stampede guard.
+
+    A fresh entry is returned as is. An entry past `ttl_seconds` but within
+    `stale_seconds` more is still returned, while one background task
+    refreshes it. On a miss the caller waits for the fetch, and concurrent
+    misses for the same key share that single upstream call. Failed fetches
+    are never cached; if an older reading exists it keeps being served.
+    """
+
+    def __init__(self, ttl_seconds: int = WEATHER_CACHE_TTL, stale_seconds: int = WEATHER_STALE_TTL,
+                 max_entries: int = WEATHER_CACHE_SIZE):
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (fetched_at monotonic, value)
+        self._inflight = {}  # key -> task fetching it
+
+        # Metrics
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.upstream_fetches = 0
+        self.coalesced = 0
+        self.fetch_errors = 0
+
+    async def get(self, key: str, fetch) -> dict:
+        """Cached value for `key`; `fetch` is a coroutine function returning a fresh one."""
+        entry = self._entries.get(key)
+        if entry:
+            age = time.monotonic() - entry[0]
+            if age < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if age < self.ttl_seconds + self.stale_seconds:
+                self._entries.move_to_end(key)
+                self.stale_hits += 1
+                self._refresh(key, fetch)
+                return entry[1]
+
+        self.misses += 1
+        return await asyncio.shield(self._refresh(key, fetch))
+
+    def put(self, key: str, value: dict, age: float = 0):
+        """Store a reading fetched elsewhere (e.g. by a batched pre-warm), `age` seconds ago."""
+        self._entries[key] = (time.monotonic() - max(0, age), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _refresh(self, key: str, fetch) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return task
+        self.upstream_fetches += 1
+        task = asyncio.ensure_future(self._fetch_and_store(key, fetch))
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._inflight.pop(key, None) if self._inflight.get(key) is done else None)
+        return task
+
+    async def _fetch_and_store(self, key: str, fetch) -> dict:
+        try:
+            value = await fetch()
+        except Exception as e:
+            value = {"error": f"Failed to fetch weather: {str(e)}"}
+
+        if "error" in value:
+            self.fetch_errors += 1
+            entry = self._entries.get(key)
+            return entry[1] if entry else value
+
+        self.put(key, value)
+        return value
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "stale_seconds": self.stale_seconds,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "upstream_fetches": self.upstream_fetches,
+            "coalesced": self.coalesced,
+            "fetch_errors": self.fetch_errors,
+            "hit_rate": ((self.hits + self.stale_hits) / lookups) if lookups else 0.0,
+        }
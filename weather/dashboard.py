@@ -0,0 +1,95 @@
+import asyncio
+import os
+import time
+import feedparser
+from weather.services import fetch_weather_by_coords_cached, get_client
+
+# Tunables (override via environment)
+DASHBOARD_DEADLINE = float(os.getenv("DASHBOARD_DEADLINE", "5"))  # seconds for the whole dashboard
+DASHBOARD_WEATHER_TIMEOUT = float(os.getenv("DASHBOARD_WEATHER_TIMEOUT", "4"))
+DASHBOARD_NEWS_TIMEOUT = float(os.getenv("DASHBOARD_NEWS_TIMEOUT", "4"))
+DASHBOARD_MARKET_TIMEOUT = float(os.getenv("DASHBOARD_MARKET_TIMEOUT", "2"))
+
+NEWS_RSS_URL = "https://news.google.com/rss/search"
+
+
+async def fetch_weather_section(location: dict):
+    lat = location.get("lat")
+    lon = location.get("lon")
+    if lat is None or lon is None:
+        return None
+    return await fetch_weather_by_coords_cached(lat, lon)
+
+
+async def fetch_news_section(location: dict) -> list[dict]:
+    """Agriculture headlines from Google News RSS, biased to the user's district and state."""
+    # Construct a query favoring agriculture/crop topics
+    query = "agriculture OR crop OR farming"
+    region = f"{location.get('district','')} {location.get('state','')}".strip()
+    q = f"{query} {region}".strip()
+    resp = await get_client().get(NEWS_RSS_URL, params={"q": q, "hl": "en-IN", "gl": "IN", "ceid": "IN:en"})
+    resp.raise_for_status()
+    # Parsing the feed is CPU work; keep it off the event loop
+    feed = await asyncio.to_thread(feedparser.parse, resp.content)
+    return [
+        {
+            "title": entry.get("title"),
+            "link": entry.get("link"),
+            "published": entry.get("published"),
+        }
+        for entry in feed.entries[:10]
+    ]
+
+
+async def fetch_market_section(location: dict) -> list[dict]:
+    # Placeholder static or pseudo source. Replace with actual API if available.
+    return [
+        {"commodity": "Wheat", "state": location.get("state"), "price_per_qtl": 2150},
+        {"commodity": "Rice", "state": location.get("state"), "price_per_qtl": 2400},
+        {"commodity": "Maize", "state": location.get("state"), "price_per_qtl": 1900},
+    ]
+
+
+# section -> (fetcher, per-source timeout, value when unavailable)
+DASHBOARD_SECTIONS = {
+    "weather": (fetch_weather_section, DASHBOARD_WEATHER_TIMEOUT, None),
+    "news": (fetch_news_section, DASHBOARD_NEWS_TIMEOUT, []),
+    "market_prices": (fetch_market_section, DASHBOARD_MARKET_TIMEOUT, []),
+}
+
+
+async def _run_section(name: str, location: dict, deadline: float) -> tuple[str, object, dict]:
+    fetch, timeout, fallback = DASHBOARD_SECTIONS[name]
+    start = time.perf_counter()
+    try:
+        value = await asyncio.wait_for(fetch(location), timeout=min(timeout, deadline))
+        if value is None:
+            status = {"status": "skipped"}
+            value = fallback
+        elif isinstance(value, dict) and "error" in value:
+            status = {"status": "error", "error": value["error"]}
+            value = fallback
+        else:
+            status = {"status": "ok"}
+    except asyncio.TimeoutError:
+        status = {"status": "timeout"}
+        value = fallback
+    except Exception as e:
+        status = {"status": "error", "error": str(e) or type(e).__name__}
+        value = fallback
+    status["ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return name, value, status
+
+
+async def build_dashboard(location: dict, deadline: float = DASHBOARD_DEADLINE, names=None) -> tuple[dict, dict]:
+    """Fetch every dashboard section (or just `names`) concurrently.
+
+    Each source gets its own timeout, capped by `deadline`, so the dashboard
+    takes as long as its slowest source (at most `deadline`) rather than
+    the sum of them. Returns (sections, status): sections that failed, timed
+    out or had no input hold their fallback value, and `status` says which.
+    """
+    results = await asyncio.gather(*(_run_section(name, location, deadline) for name in names or DASHBOARD_SECTIONS))
+    sections = {name: value for name, value, _ in results}
+    status = {name: section_status for name, _, section_status in results}
+    return sections, status
@@ -0,0 +1,161 @@
+import asyncio
+import datetime
+import os
+import socket
+import time
+from pymongo import UpdateOne
+from auth.database import db, users_collection
+from weather.cache import WEATHER_CACHE_TTL, WEATHER_STALE_TTL
+from weather.services import weather_cell, fetch_cells_async, cell_key, weather_cache
+from weather.snapshots import dashboard_snapshots
+
+# Tunables (override via environment)
+WEATHER_PREWARM = os.getenv("WEATHER_PREWARM", "true").lower() == "true"
+WEATHER_PREWARM_INTERVAL = int(os.getenv("WEATHER_PREWARM_INTERVAL", "1500"))  # seconds; below WEATHER_CACHE_TTL keeps cells fresh
+WEATHER_PREWARM_BATCH = int(os.getenv("WEATHER_PREWARM_BATCH", "50"))  # cells per Open-Meteo request
+WEATHER_PREWARM_ACTIVE_DAYS = float(os.getenv("WEATHER_PREWARM_ACTIVE_DAYS", "3"))  # only users active this recently
+WEATHER_PREWARM_SYNC_INTERVAL = int(os.getenv("WEATHER_PREWARM_SYNC_INTERVAL", "60"))  # seconds between reads of the shared readings
+
+# Only one process (across all workers and hosts) pre-warms per interval; it holds a lease in Mongo
+LEASE_ID = "weather_prewarm"
+_holder = f"{socket.gethostname()}:{os.getpid()}"
+
+# The leader publishes its readings here; every process copies them into its own weather_cache
+readings_collection = db["weather_cell_readings"]
+_indexes_ready = False
+_synced_through = None  # fetched_at of the newest shared reading copied into this process
+
+# Outcome of the last run, for /weather/cache-stats
+prewarm_state = {"last_run": None, "cells": 0, "warmed": 0, "requests": 0, "duration_s": None, "leader": False,
+                 "last_sync": None, "synced": 0}
+
+
+async def registered_cells() -> set[str]:
+    """Weather cells containing the location of at least one recently active user."""
+    cells = set()
+    active_since = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=WEATHER_PREWARM_ACTIVE_DAYS)
+    cursor = users_collection.find(
+        {"location.lat": {"$ne": None}, "location.lon": {"$ne": None}, "last_active": {"$gte": active_since}},
+        {"_id": 0, "location.lat": 1, "location.lon": 1},
+    )
+    async for user in cursor:
+        location = user.get("location") or {}
+        try:
+            cells.add(weather_cell(float(location["lat"]), float(location["lon"])))
+        except (KeyError, TypeError, ValueError):
+            continue
+    return cells
+
+
+async def acquire_lease(duration: float) -> bool:
+    """Take or renew the pre-warm lease for `duration` seconds; False if another process holds it."""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    try:
+        await db["leases"].update_one(
+            {"_id": LEASE_ID, "$or": [{"expires_at": {"$lt": now}}, {"holder": _holder}]},
+            {"$set": {"holder": _holder, "expires_at": now + datetime.timedelta(seconds=duration)}},
+            upsert=True,
+        )
+        return True
+    except Exception as e:
+        # A duplicate-key error on the upsert means the lease is held elsewhere
+        if getattr(e, "code", None) != 11000:
+            print(f"❌ Weather pre-warm lease error: {e}")
+        return False
+
+
+async def _ensure_indexes():
+    global _indexes_ready
+    if _indexes_ready:
+        return
+    try:
+        # Readings past their stale window are useless to every process; let Mongo drop them
+        await readings_collection.create_index("fetched_at", expireAfterSeconds=WEATHER_CACHE_TTL + WEATHER_STALE_TTL)
+        _indexes_ready = True
+    except Exception as e:
+        print(f"❌ Weather readings index error: {e}")
+
+
+async def publish_readings(readings: dict, fetched_at: datetime.datetime):
+    """Store `readings` (cell -> reading) in the shared collection for the other processes."""
+    if not readings:
+        return
+    await _ensure_indexes()
+    await readings_collection.bulk_write(
+        [UpdateOne({"_id": cell}, {"$set": {"reading": reading, "fetched_at": fetched_at}}, upsert=True)
+         for cell, reading in readings.items()],
+        ordered=False,
+    )
+
+
+def _utc(timestamp: datetime.datetime) -> datetime.datetime:
+    return timestamp if timestamp.tzinfo else timestamp.replace(tzinfo=datetime.timezone.utc)
+
+
+async def sync_readings() -> int:
+    """Copy shared readings published since the last sync into this process's cache and dashboards."""
+    global _synced_through
+    now = datetime.datetime.now(datetime.timezone.utc)
+    since = _synced_through or now - datetime.timedelta(seconds=WEATHER_CACHE_TTL + WEATHER_STALE_TTL)
+    readings = {}
+    async for doc in readings_collection.find({"fetched_at": {"$gt": since}}):
+        fetched_at = _utc(doc["fetched_at"])
+        weather_cache.put(cell_key(doc["_id"]), doc["reading"], age=(now - fetched_at).total_seconds())
+        readings[doc["_id"]] = doc["reading"]
+        _synced_through = max(_synced_through or fetched_at, fetched_at)
+    dashboard_snapshots.invalidate_cells(readings)
+    prewarm_state.update({"last_sync": now.isoformat(), "synced": prewarm_state["synced"] + len(readings)})
+    return len(readings)
+
+
+async def prewarm_once() -> dict:
+    """Fetch every recently active user's cell in batched requests, store the readings and publish them."""
+    start = time.time()
+    cells = sorted(await registered_cells())
+    warmed = 0
+    requests_made = 0
+    for i in range(0, len(cells), max(1, WEATHER_PREWARM_BATCH)):
+        readings = await fetch_cells_async(cells[i:i + WEATHER_PREWARM_BATCH])
+        requests_made += 1
+        readings = {cell: reading for cell, reading in readings.items() if "error" not in reading}
+        for cell, reading in readings.items():
+            weather_cache.put(cell_key(cell), reading)
+        # Push the new readings into the dashboards built on them, here and (via the shared store) elsewhere
+        dashboard_snapshots.invalidate_cells(readings)
+        try:
+            await publish_readings(readings, datetime.datetime.now(datetime.timezone.utc))
+        except Exception as e:
+            print(f"❌ Weather readings publish failed: {e}")
+        warmed += len(readings)
+
+    prewarm_state.update({
+        "last_run": datetime.datetime.now().isoformat(),
+        "cells": len(cells),
+        "warmed": warmed,
+        "requests": requests_made,
+        "duration_s": round(time.time() - start, 2),
+    })
+    print(f"⏱️ Weather pre-warm: {warmed}/{len(cells)} cell(s) in {requests_made} request(s), {prewarm_state['duration_s']:.2f}s")
+    return prewarm_state
+
+
+async def run_prewarmer(interval: float = WEATHER_PREWARM_INTERVAL, sync_interval: float = WEATHER_PREWARM_SYNC_INTERVAL):
+    """Background task, in every process, until cancelled.
+
+    Every `interval` seconds the process holding the lease pre-warms and
+    publishes the readings; every `sync_interval` seconds the others copy
+    newly published readings into their own cache.
+    """
+    next_run = 0.0
+    while True:
+        try:
+            if time.monotonic() >= next_run:
+                next_run = time.monotonic() + interval
+                prewarm_state["leader"] = await acquire_lease(interval * 1.5)
+                if prewarm_state["leader"]:
+                    await prewarm_once()
+            if not prewarm_state["leader"]:
+                await sync_readings()
+        except Exception as e:
+            print(f"❌ Weather pre-warm failed: {e}")
+        await asyncio.sleep(min(interval, sync_interval))
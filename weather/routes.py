@@ -1,84 +1,49 @@
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, HTTPException, Request, Response
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
-from weather.services import fetch_weather, fetch_weather_by_coords
-import requests
-import feedparser
-from auth.database import users_collection
+from weather.services import fetch_weather_cached, fetch_weather_by_coords_cached, weather_cache
+from weather.prewarm import prewarm_state
+from weather.snapshots import dashboard_snapshots
 from chatbot.models import DashboardResponse
+from auth.database import touch_last_active
 
 router = APIRouter()
 
 # Set up Jinja2 templates
 templates = Jinja2Templates(directory="templates")
 
+@router.get("/cache-stats")
+async def cache_stats():
+    """Hit rates of the weather cache, upstream fetches saved by it, and the last cell pre-warm."""
+    return {**weather_cache.stats(), "prewarm": prewarm_state, "dashboard_snapshots": dashboard_snapshots.stats()}
+
 @router.get("/{location}")
 async def get_weather(location: str):
-    data = fetch_weather(location)
+    data = await fetch_weather_cached(location)
     if "error" in data:
         raise HTTPException(status_code=500, detail=data["error"])
     return data
 
 @router.get("/dashboard", response_class=HTMLResponse)
 async def weather_dashboard(request: Request, location: str = "London"):
-    weather_data = fetch_weather(location)
+    weather_data = await fetch_weather_cached(location)
     if "error" in weather_data:
         weather_data = {"location": location, "error": weather_data["error"]}
     return templates.TemplateResponse("dashboard.html", {"request": request, "weather": weather_data})
 
 
 @router.get("/dashboard/{phone}", response_model=DashboardResponse)
-async def dashboard(phone: str):
-    # Load user
-    user = await users_collection.find_one({"phone": phone})
-    if not user:
+async def dashboard(phone: str, request: Request):
+    # Served from a precomputed snapshot; weather, news and market prices are
+    # fetched concurrently only when it is missing or expired
+    snapshot = await dashboard_snapshots.get(phone)
+    if snapshot is None:
         raise HTTPException(status_code=404, detail="User not found")
-
-    name = user.get("name")
-    location = user.get("location") or {}
-    lat = location.get("lat")
-    lon = location.get("lon")
-
-    # Weather by coordinates
-    weather = None
-    if lat is not None and lon is not None:
-        weather = fetch_weather_by_coords(lat, lon)
-
-    # News: use Google News RSS with geo keywords
-    news_items = []
-    try:
-        # Construct a query favoring agriculture/crop topics
-        query = "agriculture OR crop OR farming"
-        region = f"{location.get('district','')} {location.get('state','')}".strip()
-        q = f"{query} {region}".strip()
-        url = f"https://news.google.com/rss/search?q={requests.utils.quote(q)}&hl=en-IN&gl=IN&ceid=IN:en"
-        feed = feedparser.parse(url)
-        for entry in feed.entries[:10]:
-            news_items.append({
-                "title": entry.get("title"),
-                "link": entry.get("link"),
-                "published": entry.get("published"),
-            })
-    except Exception:
-        news_items = []
-
-    # Market prices: placeholder using Agmarknet-like structure (no key used)
-    market_prices = []
-    try:
-        # Placeholder static or pseudo source. Replace with actual API if available.
-        # For demo, fetch a public JSON sample or construct a simple list
-        market_prices = [
-            {"commodity": "Wheat", "state": location.get("state"), "price_per_qtl": 2150},
-            {"commodity": "Rice", "state": location.get("state"), "price_per_qtl": 2400},
-            {"commodity": "Maize", "state": location.get("state"), "price_per_qtl": 1900},
-        ]
-    except Exception:
-        market_prices = []
-
-    return DashboardResponse(
-        name=name,
-        location=location,
-        weather=weather,
-        news=news_items,
-        market_prices=market_prices,
-    )
\ No newline at end of file
+    await touch_last_active(phone)
+
+    headers = {"ETag": snapshot.etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if snapshot.etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+        dashboard_snapshots.not_modified += 1
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
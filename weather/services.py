@@ -1,20 +1,99 @@
+import os
+import httpx
 import requests
+from weather import geohash
+from weather.cache import WeatherCache
+
+# Tunables (override via environment)
+WEATHER_TIMEOUT = float(os.getenv("WEATHER_TIMEOUT", "10"))  # seconds
+WEATHER_MAX_CONNECTIONS = int(os.getenv("WEATHER_MAX_CONNECTIONS", "50"))
+WEATHER_GEOHASH_PRECISION = int(os.getenv("WEATHER_GEOHASH_PRECISION", "5"))  # coordinates in one cell share a reading (~5 km)
+
+WTTR_URL = "http://wttr.in/{location}?format=j1"
+OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
+
+
+def parse_wttr(location: str, data: dict) -> dict:
+    current = data.get("current_condition", [{}])[0]
+    return {
+        "location": location,
+        "temperature_c": current.get("temp_C"),
+        "temperature_f": current.get("temp_F"),
+        "description": current.get("weatherDesc", [{}])[0].get("value"),
+        "humidity": current.get("humidity"),
+        "wind_speed_kph": current.get("windspeedKmph"),
+        "feels_like_c": current.get("FeelsLikeC"),
+    }
+
+
+def open_meteo_params(lat, lon) -> dict:
+    """Query for one point, or for several when `lat`/`lon` are comma-separated lists."""
+    return {
+        "latitude": lat,
+        "longitude": lon,
+        "current": [
+            "temperature_2m",
+            "relative_humidity_2m",
+            "wind_speed_10m",
+            "weather_code",
+        ],
+        "hourly": ["temperature_2m"],
+        "daily": ["temperature_2m_max", "temperature_2m_min"],
+        "timezone": "auto",
+    }
+
+
+def wmo_desc(code: int) -> str:
+    mapping = {
+        0: "Clear sky",
+        1: "Mainly clear",
+        2: "Partly cloudy",
+        3: "Overcast",
+        45: "Fog",
+        48: "Depositing rime fog",
+        51: "Light drizzle",
+        53: "Moderate drizzle",
+        55: "Dense drizzle",
+        61: "Slight rain",
+        63: "Moderate rain",
+        65: "Heavy rain",
+        71: "Slight snow",
+        73: "Moderate snow",
+        75: "Heavy snow",
+        95: "Thunderstorm",
+    }
+    return mapping.get(code, "Unknown")
+
+
+def parse_open_meteo(data: dict) -> dict:
+    current = data.get("current", {})
+    daily = data.get("daily", {})
+    return {
+        "temperature_c": current.get("temperature_2m"),
+        "humidity": current.get("relative_humidity_2m"),
+        "wind_speed_kmh": current.get("wind_speed_10m"),
+        "condition": wmo_desc(current.get("weather_code", -1)),
+        "forecast": [
+            {
+                "date": d,
+                "temp_max_c": tmax,
+                "temp_min_c": tmin,
+            }
+            for d, tmax, tmin in zip(
+                daily.get("time", []) or [],
+                daily.get("temperature_2m_max", []) or [],
+                daily.get("temperature_2m_min", []) or [],
+            )
+        ],
+    }
+
+
 def fetch_weather(location: str) -> dict:
-    url = f"http://wttr.in/{location}?format=j1"
+    url = WTTR_URL.format(location=location)
     try:
         resp = requests.get(url, timeout=10)
         resp.raise_for_status()
-        data = resp.json()
-        current = data.get("current_condition", [{}])[0]
-        return {
-            "location": location,
-            "temperature_c": current.get("temp_C"),
-            "temperature_f": current.get("temp_F"),
-            "description": current.get("weatherDesc", [{}])[0].get("value"),
-            "humidity": current.get("humidity"),
-            "wind_speed_kph": current.get("windspeedKmph"),
-            "feels_like_c": current.get("FeelsLikeC"),
-        }
+        return parse_wttr(location, resp.json())
     except requests.RequestException as e:
         return {"error": f"Failed to fetch weather: {str(e)}"}
 
@@ -24,65 +103,101 @@ def fetch_weather_by_coords(lat: float, lon: float) -> dict:
     Fetch current weather and a short forecast using Open-Meteo (no API key required).
     """
     try:
-        base = "https://api.open-meteo.com/v1/forecast"
-        params = {
-            "latitude": lat,
-            "longitude": lon,
-            "current": [
-                "temperature_2m",
-                "relative_humidity_2m",
-                "wind_speed_10m",
-                "weather_code",
-            ],
-            "hourly": ["temperature_2m"],
-            "daily": ["temperature_2m_max", "temperature_2m_min"],
-            "timezone": "auto",
-        }
-        resp = requests.get(base, params=params, timeout=10)
+        resp = requests.get(OPEN_METEO_URL, params=open_meteo_params(lat, lon), timeout=10)
+        resp.raise_for_status()
+        return parse_open_meteo(resp.json())
+    except requests.RequestException as e:
+        return {"error": f"Failed to fetch weather: {str(e)}"}
+
+
+# Async service: shared keep-alive client plus a cache in front of both providers
+
+_client = None
+
+# Shared cache for the weather and dashboard routes
+weather_cache = WeatherCache()
+
+
+def get_client() -> httpx.AsyncClient:
+    """Shared keep-alive client for wttr.in, Open-Meteo and the dashboard feeds, created on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=WEATHER_TIMEOUT,
+            limits=httpx.Limits(max_connections=WEATHER_MAX_CONNECTIONS, max_keepalive_connections=WEATHER_MAX_CONNECTIONS),
+        )
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def weather_cell(lat: float, lon: float) -> str:
+    """Geohash of the WEATHER_GEOHASH_PRECISION cell containing (lat, lon)."""
+    return geohash.encode(lat, lon, WEATHER_GEOHASH_PRECISION)
+
+
+def cell_center(cell: str) -> tuple[float, float]:
+    lat, lon = geohash.decode(cell)
+    return round(lat, 4), round(lon, 4)
+
+
+async def _fetch_weather_async(location: str) -> dict:
+    try:
+        resp = await get_client().get(WTTR_URL.format(location=location))
+        resp.raise_for_status()
+        return parse_wttr(location, resp.json())
+    except (httpx.HTTPError, ValueError) as e:
+        return {"error": f"Failed to fetch weather: {str(e)}"}
+
+
+async def _fetch_weather_by_coords_async(lat: float, lon: float) -> dict:
+    try:
+        resp = await get_client().get(OPEN_METEO_URL, params=open_meteo_params(lat, lon))
+        resp.raise_for_status()
+        return parse_open_meteo(resp.json())
+    except (httpx.HTTPError, ValueError) as e:
+        return {"error": f"Failed to fetch weather: {str(e)}"}
+
+
+async def fetch_weather_cached(location: str) -> dict:
+    """Async, cached counterpart of `fetch_weather`."""
+    key = f"loc:{location.strip().lower()}"
+    return await weather_cache.get(key, lambda: _fetch_weather_async(location))
+
+
+async def fetch_cells_async(cells: list[str]) -> dict:
+    """Readings for several cells from one Open-Meteo request, keyed by cell (failed cells are left out)."""
+    centers = [cell_center(cell) for cell in cells]
+    params = open_meteo_params(
+        ",".join(str(lat) for lat, _ in centers),
+        ",".join(str(lon) for _, lon in centers),
+    )
+    try:
+        resp = await get_client().get(OPEN_METEO_URL, params=params)
         resp.raise_for_status()
         data = resp.json()
+    except (httpx.HTTPError, ValueError) as e:
+        print(f"❌ Batched weather fetch failed for {len(cells)} cell(s): {e}")
+        return {}
+    # A single location comes back as an object, several as a list in request order
+    results = data if isinstance(data, list) else [data]
+    return {
+        cell: parse_open_meteo(result)
+        for cell, result in zip(cells, results)
+        if isinstance(result, dict) and not result.get("error")
+    }
 
-        current = data.get("current", {})
-        daily = data.get("daily", {})
-
-        def wmo_desc(code: int) -> str:
-            mapping = {
-                0: "Clear sky",
-                1: "Mainly clear",
-                2: "Partly cloudy",
-                3: "Overcast",
-                45: "Fog",
-                48: "Depositing rime fog",
-                51: "Light drizzle",
-                53: "Moderate drizzle",
-                55: "Dense drizzle",
-                61: "Slight rain",
-                63: "Moderate rain",
-                65: "Heavy rain",
-                71: "Slight snow",
-                73: "Moderate snow",
-                75: "Heavy snow",
-                95: "Thunderstorm",
-            }
-            return mapping.get(code, "Unknown")
-
-        return {
-            "temperature_c": current.get("temperature_2m"),
-            "humidity": current.get("relative_humidity_2m"),
-            "wind_speed_kmh": current.get("wind_speed_10m"),
-            "condition": wmo_desc(current.get("weather_code", -1)),
-            "forecast": [
-                {
-                    "date": d,
-                    "temp_max_c": tmax,
-                    "temp_min_c": tmin,
-                }
-                for d, tmax, tmin in zip(
-                    daily.get("time", []) or [],
-                    daily.get("temperature_2m_max", []) or [],
-                    daily.get("temperature_2m_min", []) or [],
-                )
-            ],
-        }
-    except requests.RequestException as e:
-        return {"error": f"Failed to fetch weather: {str(e)}"}
\ No newline at end of file
+
+def cell_key(cell: str) -> str:
+    return f"cell:{cell}"
+
+
+async def fetch_weather_by_coords_cached(lat: float, lon: float) -> dict:
+    """Async, cached counterpart of `fetch_weather_by_coords`; readings are shared per geohash cell."""
+    cell = weather_cell(lat, lon)
+    return await weather_cache.get(cell_key(cell), lambda: _fetch_weather_by_coords_async(*cell_center(cell)))
@@ -0,0 +1,232 @@
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from auth.database import users_collection
+from chatbot.models import DashboardResponse
+from weather.dashboard import build_dashboard
+from weather.services import weather_cell
+
+# Tunables (override via environment)
+DASHBOARD_SNAPSHOT_TTL = int(os.getenv("DASHBOARD_SNAPSHOT_TTL", "900"))  # seconds a complete snapshot is served
+DASHBOARD_SNAPSHOT_DEGRADED_TTL = int(os.getenv("DASHBOARD_SNAPSHOT_DEGRADED_TTL", "60"))  # same, when a section failed
+DASHBOARD_SNAPSHOT_SIZE = int(os.getenv("DASHBOARD_SNAPSHOT_SIZE", "5000"))
+DASHBOARD_SNAPSHOT_REFRESH_INTERVAL = int(os.getenv("DASHBOARD_SNAPSHOT_REFRESH_INTERVAL", "300"))  # seconds
+DASHBOARD_SNAPSHOT_ACTIVE_WINDOW = int(os.getenv("DASHBOARD_SNAPSHOT_ACTIVE_WINDOW", "3600"))  # only refresh snapshots read this recently
+DASHBOARD_SNAPSHOT_CONCURRENCY = int(os.getenv("DASHBOARD_SNAPSHOT_CONCURRENCY", "8"))  # background rebuilds at once
+
+
+class Snapshot:
+    __slots__ = ("name", "location", "sections", "status", "body", "etag", "cell", "complete",
+                 "built_at", "expires_at", "last_access")
+
+    def __init__(self, name: str, location: dict, sections: dict, status: dict):
+        self.name = name
+        self.location = location
+        self.sections = sections
+        self.status = status
+        self.body = self._serialize(status)
+        # Latencies differ on every build; leave them out so identical data keeps its ETag
+        stable_status = {section: {k: v for k, v in value.items() if k != "ms"} for section, value in status.items()}
+        self.etag = f'"{hashlib.sha256(self._serialize(stable_status)).hexdigest()[:32]}"'
+        try:
+            self.cell = weather_cell(float(location["lat"]), float(location["lon"]))
+        except (KeyError, TypeError, ValueError):
+            self.cell = None
+        self.complete = all(section["status"] in ("ok", "skipped") for section in status.values())
+        self.built_at = time.monotonic()
+        self.expires_at = self.built_at + (DASHBOARD_SNAPSHOT_TTL if self.complete else DASHBOARD_SNAPSHOT_DEGRADED_TTL)
+        self.last_access = self.built_at
+
+    def _serialize(self, status: dict) -> bytes:
+        return DashboardResponse(
+            name=self.name,
+            location=self.location,
+            weather=self.sections["weather"],
+            news=self.sections["news"],
+            market_prices=self.sections["market_prices"],
+            status=status,
+        ).model_dump_json().encode()
+
+
+async def build_snapshot(phone: str) -> Snapshot | None:
+    """Serialized DashboardResponse for `phone`, or None if there is no such user."""
+    user = await users_collection.find_one({"phone": phone})
+    if not user:
+        return None
+    location = user.get("location") or {}
+    sections, status = await build_dashboard(location)
+    return Snapshot(user.get("name"), location, sections, status)
+
+
+async def refresh_weather(snapshot: Snapshot) -> Snapshot:
+    """`snapshot` with only its weather section re-fetched; news and prices are reused as they are."""
+    sections, status = await build_dashboard(snapshot.location, names=["weather"])
+    refreshed = Snapshot(snapshot.name, snapshot.location, {**snapshot.sections, **sections}, {**snapshot.status, **status})
+    # The reused sections are no fresher than before
+    refreshed.expires_at = min(refreshed.expires_at, snapshot.expires_at)
+    refreshed.last_access = snapshot.last_access
+    return refreshed
+
+
+class DashboardSnapshotStore:
+    """Materialized, ready-to-send dashboards keyed by phone.
+
+    A request for a fresh snapshot is served from memory; a missing or
+    expired one is rebuilt, with concurrent requests for the same phone
+    sharing that build. Snapshots read within `active_window` seconds are
+    kept warm in the background: their weather section is re-fetched when
+    their user's cell gets a new reading (`invalidate_cells`), and they are
+    rebuilt before they expire (`run_refresher`). Other snapshots are left
+    to be rebuilt on their next request, so background load follows actual
+    use. The ETag hashes the content without section latencies, so a
+    rebuild that changes nothing still answers If-None-Match with a 304.
+    """
+
+    def __init__(self, builder=build_snapshot, weather_refresher=refresh_weather, max_entries: int = DASHBOARD_SNAPSHOT_SIZE,
+                 active_window: float = DASHBOARD_SNAPSHOT_ACTIVE_WINDOW, concurrency: int = DASHBOARD_SNAPSHOT_CONCURRENCY):
+        self.builder = builder
+        self.weather_refresher = weather_refresher
+        self.max_entries = max_entries
+        self.active_window = active_window
+        self._entries = OrderedDict()  # phone -> Snapshot
+        self._inflight = {}  # (phone, weather_only) -> task building it
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.builds = 0
+        self.coalesced = 0
+        self.invalidations = 0
+        self.build_errors = 0
+        self.not_modified = 0
+
+    async def get(self, phone: str) -> Snapshot | None:
+        snapshot = self._entries.get(phone)
+        now = time.monotonic()
+        if snapshot and snapshot.expires_at > now:
+            snapshot.last_access = now
+            self._entries.move_to_end(phone)
+            self.hits += 1
+            return snapshot
+        self.misses += 1
+        snapshot = await asyncio.shield(self._rebuild(phone))
+        if snapshot is not None:
+            snapshot.last_access = time.monotonic()
+        return snapshot
+
+    def _is_active(self, snapshot: Snapshot, now: float) -> bool:
+        return now - snapshot.last_access < self.active_window
+
+    def _rebuild(self, phone: str, background: bool = False, weather_only: bool = False) -> asyncio.Task:
+        key = (phone, weather_only)
+        task = self._inflight.get(key) or self._inflight.get((phone, False))
+        if task is not None:
+            self.coalesced += 1
+            return task
+        self.builds += 1
+        task = asyncio.ensure_future(self._build_and_store(phone, background, weather_only))
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._inflight.pop(key, None) if self._inflight.get(key) is done else None)
+        return task
+
+    async def _build(self, phone: str, base: Snapshot | None) -> Snapshot | None:
+        return await (self.weather_refresher(base) if base is not None else self.builder(phone))
+
+    async def _build_and_store(self, phone: str, background: bool, weather_only: bool) -> Snapshot | None:
+        base = self._entries.get(phone) if weather_only else None
+        try:
+            if background:
+                # Bound the fan-out of a mass invalidation; requests never wait on this
+                async with self._semaphore:
+                    snapshot = await self._build(phone, base)
+            else:
+                snapshot = await self._build(phone, base)
+        except Exception as e:
+            self.build_errors += 1
+            print(f"❌ Dashboard snapshot build failed for {phone}: {e}")
+            if background:
+                return self._entries.get(phone)
+            raise
+
+        if snapshot is None:
+            self._entries.pop(phone, None)
+            return None
+        if base is not None and self._entries.get(phone) is not base:
+            # A full rebuild replaced the snapshot this refresh started from
+            return self._entries.get(phone)
+        self._entries[phone] = snapshot
+        self._entries.move_to_end(phone)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return snapshot
+
+    def invalidate(self, phone: str, weather_only: bool = False):
+        """Rebuild `phone`'s snapshot in the background if it is in active use, otherwise drop it."""
+        snapshot = self._entries.get(phone)
+        if snapshot is None:
+            return
+        self.invalidations += 1
+        if self._is_active(snapshot, time.monotonic()):
+            self._rebuild(phone, background=True, weather_only=weather_only)
+        else:
+            del self._entries[phone]
+
+    def invalidate_cells(self, cells):
+        """Re-fetch the weather section of every snapshot whose user's location lies in one of `cells`."""
+        cells = set(cells)
+        for phone in [phone for phone, snapshot in self._entries.items() if snapshot.cell in cells]:
+            self.invalidate(phone, weather_only=True)
+
+    def refresh_expiring(self, within: float) -> int:
+        """Start rebuilds for active, complete snapshots expiring in the next `within` seconds.
+
+        Degraded snapshots are left to their next request rather than retried
+        every pass, and expired snapshots nobody read recently are dropped.
+        """
+        now = time.monotonic()
+        horizon = now + within
+        refreshed = 0
+        for phone, snapshot in list(self._entries.items()):
+            if snapshot.expires_at > horizon:
+                continue
+            if self._is_active(snapshot, now):
+                if snapshot.complete:
+                    self._rebuild(phone, background=True)
+                    refreshed += 1
+            elif snapshot.expires_at <= now:
+                del self._entries[phone]
+        return refreshed
+
+    async def run_refresher(self, interval: float = DASHBOARD_SNAPSHOT_REFRESH_INTERVAL):
+        """Background task: every `interval` seconds, rebuild what would expire before the next pass."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                count = self.refresh_expiring(interval)
+                if count:
+                    print(f"⏱️ Refreshing {count} dashboard snapshot(s)")
+            except Exception as e:
+                print(f"❌ Dashboard snapshot refresh failed: {e}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "active_window_seconds": self.active_window,
+            "hits": self.hits,
+            "misses": self.misses,
+            "builds": self.builds,
+            "coalesced": self.coalesced,
+            "invalidations": self.invalidations,
+            "build_errors": self.build_errors,
+            "not_modified": self.not_modified,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+        }
+
+
+# Shared store for /weather/dashboard/{phone}
+dashboard_snapshots = DashboardSnapshotStore()